@@ -1,218 +1,74 @@
-import pygame
-import numpy as np
-from collections import deque
-from datetime import datetime
-
 # Include top level modules
 import os, sys
 current_dir = os.path.dirname(__file__)
 sys.path.append(os.path.abspath(os.path.join(current_dir, '..')))
 
-from characters import (
-    # Characters
-    Snake, 
-    Food, 
-    Explosive,
-    
-    # Display variables
-    win_height,
-    win_width,
-)
+import numpy as np
 
+from state import DIRECTION_NAMES
+from pathfinding import get_bfs, CachedPlanner, DistanceField
+from bitboard import get_bitboard, with_fallback
+from runner import play, parse_args, timing_options
+from records import append_record
 
+SNAKE_SPEED = 30
+# Search every tick, follow the last path until it is stale, follow the distances to the food
+# or search every tick with bitboard flood fills
+PLANNERS = ("replan", "cached", "field", "bitboard")
 
 steps = 0 # Track the number of steps taken by the snake
 
-def update_matrix(curr_matrix, snakes, food, explosives):
-    """Update the position of characters in matrix"""
-    
-    # Update snakes's body and explostions in matrix
-    # Switch x and y because of numpy (height -> row, width -> column)
-    for pos in (snakes + explosives):
-        x, y = pos[0]//10, pos[1]//10
-        curr_matrix[y][x] = 2
-    
-    # Update food in matrix
-    x, y = food[0]//10, food[1]//10
-    curr_matrix[y][x] = 1  
-    
-    return curr_matrix
+def make_next_move(matrix, head):
+    """Select next move of snake towards the closest food (head is a (row, col) position)"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.int8)
+    h, w = matrix.shape
+    direction = get_bfs(h, w).first_step(matrix, head[0] * w + head[1])
+    return DIRECTION_NAMES[direction] if direction is not None else None
 
-def make_next_move(matrix, head, food):
-    """Select next move of snake"""
-    
-    h, w = len(matrix), len(matrix[0])
-    visited = [[False for _ in range(w)] for _ in range(h)]
-    directions = [ 
-        {"name": "LEFT", "value": (0, -1)},
-        {"name": "UP", "value": (-1, 0)},
-        {"name": "RIGHT", "value": (0, 1)},
-        {"name": "DOWN", "value": (1, 0)}, 
-    ]
-    head = (head[1]//10, head[0]//10) # Scale position of head and reverse for numpy
-    food = (food[1]//10, food[0]//10) # Scale position of food and reverse for numpy
-    visited[head[0]][head[1]] = True # Mark the position of head as visited
-    queue = deque([[head]]) # Initialise queue unique paths with position of snake's head
-    
-    move = None
-    while queue:
-        path = queue.popleft()
-        curr = path[-1]
-        
-        # Stop searching and make move when food is found OR
-        if matrix[curr[0]][curr[1]] == 1:
-            move = path[1] # Set move to next step from head   
-            break
-        
-        # Find next possible moves
-        for d in directions:
-            
-            y, x = d["value"]
-            next_y, next_x = curr[0] + y, curr[1] + x
-            next_coord = (next_y, next_x)
-            
-            # Skip moves where snake crashes into wall
-            if (next_y < 0 or next_y >= h or next_x < 0 or next_x >= w):
-                continue
-            
-            # Skip moves where snake crashes into explosives or itself
-            if matrix[next_y][next_x] == 2:
-                continue
-            
-            # Skip nodes that have already been visited
-            if visited[next_y][next_x]:
-                continue
-        
-            queue.append(path + [next_coord])
-            visited[next_y][next_x] = True 
-           
-    if move:        
-        # Select direction 
-        move_pos = (move[0] - head[0], move[1] - head[1])
-        for d in directions:
-            if d["value"] == move_pos:
-                move = d["name"] # Change move to direction name
-                break   
-    return move
-
-
-def update_record(score):
+
+def update_record(score, planner="replan"):
     """Log the stats of the most recent game"""
-    current_time = datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-    record = f"\nbfs,{score},{steps},{steps//score},{current_time}"
-    logger_file_path = os.path.abspath(os.path.join(current_dir, '..', 'logger.csv'))
-    with open(logger_file_path, 'a') as f:
-        f.write(record)
-    return None
+    append_record("bfs" if planner == "replan" else f"bfs_{planner}", score, steps)
 
 
-def game_loop():
-    """Main game loop"""
+def choose_direction(state):
+    """Policy of the BFS player"""
+    return get_bfs(state.height, state.width).first_step(state.board.cells, state.head)
 
-    # Constants
-    SNAKE_SPEED = 30
-    explosive_TIMER = 0
-    SNAKE_COLOR = (255, 255, 255)
-    FOOD_COLOR = (255, 255, 255)
-    explosive_COLOR = (255, 0, 0)
-    BG_COLOR = (0, 0, 0)
-    TEXT_COLOR = (255, 255, 255)
-    global steps
 
-    # Set up game clock
-    clock = pygame.time.Clock()
-
-    # Initialize Pygame
-    pygame.init()
-    win = pygame.display.set_mode((win_width, win_height))
-    font = pygame.font.SysFont(None, 35)
-
-    score = 1
-    snake = Snake()
-    food = Food()
-    explosive = Explosive()
-
-    while True:
-        # Zero all cells in matrix
-        """
-        Values in matrix
-        0 - empty cell
-        1 - food
-        2 - dangerous cells (snake's body and explosives)
-        """
-        matrix = np.zeros((win_height//10, win_width//10))
-        
-        # Update cells of matrix
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                
-        new_snake_direction = make_next_move(
-            matrix=matrix, 
-            head=snake.body[0],
-            food=food.position,
-        )
-        if new_snake_direction:
-            snake.direction = new_snake_direction
-            steps += 1
-        else: # End game because no valid move was found
-            update_record(score)
-            break
-
-        # Move the snake
-        snake.grow() 
-        
-        # Logic for eating food and spawning new one
-        if snake.body[0] == food.position:
-            score += 1
-            food.spawn_new_food(matrix=matrix)
-        # If no food eaten, remove last segment of snake
-        else: 
-            snake.shrink()
-            
-        # Update cells of matrix (effect change in food's position)
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
-        
-        # Logic for spawning explosives
-        explosive_TIMER += 1
-        if explosive_TIMER % 20 == 0: 
-            explosive.spawn_explosive(matrix=matrix)
-            
-        # Logic for timing out explosives
-        if explosive_TIMER % 200 == 0:
-            explosive.destroy_explosive(0)
-            
-        # Drawing snake, good food and explosives
-        win.fill(BG_COLOR)
-        for segment in snake.body:
-            pygame.draw.rect(win, SNAKE_COLOR, pygame.Rect(segment[0], segment[1], snake.size, snake.size))
-        pygame.draw.rect(win, FOOD_COLOR, pygame.Rect(food.position[0], food.position[1], food.size, food.size))
-        if explosive.explosives:
-            for explo in explosive.explosives:
-                pygame.draw.rect(win, explosive_COLOR, pygame.Rect(explo[0], explo[1], explosive.size, explosive.size))
-                
-        # Display score
-        score_text = font.render(f"Score: {score}", True, TEXT_COLOR)
-        win.blit(score_text, (10, 10))
-
-        pygame.display.update()
-        clock.tick(SNAKE_SPEED)
-    
-    # Display final scores
-    font = pygame.font.SysFont(None, 60)
-    game_over_text_1 = font.render(f"Game Over", True, TEXT_COLOR)
-    game_over_text_2 = font.render(f"Final score: {score}", True, TEXT_COLOR)
-    win.blit(game_over_text_1, (270, 220))
-    win.blit(game_over_text_2, (250, 270))
-    pygame.display.update()
-    pygame.time.delay(5000) # Display final score for 5 seconds
+def make_planner(planner="replan"):
+    """Planner of the BFS player (returns None when there is no path to the food)"""
+    if planner == "cached":
+        return CachedPlanner()
+    if planner == "field":
+        return DistanceField()
+    if planner == "bitboard":
+        return lambda state: get_bitboard(state.height, state.width).first_step(state.board.cells, state.head)
+    return choose_direction
+
+
+def make_policy(planner="replan"):
+    """Policy of the BFS player with the given planner; without a path to the food
+    the snake moves where it has the most room"""
+    return with_fallback(make_planner(planner))
+
+
+def game_loop(headless=False, seed=None, replay_path=None, speed=SNAKE_SPEED, planner="replan", **display_options):
+    """Main game loop"""
+    global steps
     
-    # End game
-    pygame.quit()
+    policy = make_planner(planner)
+    state = play(with_fallback(policy), headless=headless, speed=speed, seed=seed, replay_path=replay_path, **display_options)
+    steps = state.steps
+    if planner in ("cached", "field"):
+        print(f"Searches: {policy.searches} in {policy.moves} moves")
+    update_record(state.score, planner)
 
 
 # Command to run game
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    args = parse_args("Snake played by BFS", planners=PLANNERS)
+    game_loop(
+        headless=args.headless, seed=args.seed, replay_path=args.replay, planner=args.planner,
+        **timing_options(args, SNAKE_SPEED),
+    )
@@ -0,0 +1,198 @@
+# BOARD AS BITS OF PYTHON INTS
+"""
+A set of cells is one int with a bit per cell. Rows are width + 1 bits apart;
+the extra (padding) bit at the end of every row is never set, so shifting by
+one moves cells left or right without wrapping into the next row, and
+shifting by a row moves them up or down.
+
+A flood fill grows a whole frontier per iteration with four shifts and a
+mask, so a search across the 60x80 board takes one iteration per step of
+distance (at most a few hundred) instead of one Python-level visit per cell.
+
+first_step floods from the goal until it reaches a neighbour of the head and
+moves to the first such neighbour in the order LEFT, UP, RIGHT, DOWN: the
+first step of a shortest path, like the BFS, but ties between paths of the
+same length can be broken differently.
+
+move_areas measures the room the snake has after each of its four moves in
+a single flood fill: the four boards after the moves are stacked in one int
+(one lane per move, with an empty padding row between lanes), so the fill
+grows all four regions with the same shifts.
+"""
+import numpy as np
+
+from board import FOOD, DANGER
+from pathfinding import get_bfs
+
+
+class BitBoard:
+    __slots__ = ("height", "width", "stride", "neighbors", "padded")
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.stride = width + 1 # Bits per row (with the padding bit)
+        self.neighbors = get_bfs(height, width).neighbors
+        self.padded = np.zeros((height, width + 1), dtype=bool) # Padding column stays False
+
+    def bit(self, cell):
+        """Set with only cell"""
+        row, col = divmod(cell, self.width)
+        return 1 << (row * self.stride + col)
+
+    def mask(self, where):
+        """Set of the cells where the flat bool array where is True"""
+        self.padded[:, :self.width] = where.reshape(self.height, self.width)
+        return int.from_bytes(np.packbits(self.padded, bitorder='little').tobytes(), 'little')
+
+    def cells(self, bits):
+        """Flat indices of the cells of a set"""
+        flags = np.unpackbits(
+            np.frombuffer(bits.to_bytes((self.height * self.stride + 7) // 8, 'little'), dtype=np.uint8),
+            bitorder='little',
+        )[:self.height * self.stride]
+        return np.flatnonzero(flags.reshape(self.height, self.stride)[:, :self.width].ravel())
+
+    def grow(self, bits, open_bits):
+        """Adds the open cells next to the cells of bits"""
+        stride = self.stride
+        return (bits | bits << 1 | bits >> 1 | bits << stride | bits >> stride) & open_bits
+
+    def flood(self, seeds, open_bits):
+        """Open cells reachable from seeds, and the number of iterations it took"""
+        region, steps = seeds & open_bits, 0
+        while True:
+            grown = self.grow(region, open_bits)
+            if grown == region:
+                return region, steps
+            region, steps = grown, steps + 1
+
+    def open_neighbors(self, cells, cell):
+        """Set of the cells next to cell that are not dangerous"""
+        bits = 0
+        for nxt, _ in self.neighbors[cell]:
+            if cells[nxt] != DANGER:
+                bits |= self.bit(nxt)
+        return bits
+
+    def reachable(self, cells, start):
+        """Number of cells the snake can reach from start (start itself not counted)"""
+        open_bits = self.mask(cells != DANGER)
+        region, _ = self.flood(self.open_neighbors(cells, start), open_bits)
+        return region.bit_count()
+
+    def distance(self, cells, start, goal=FOOD):
+        """Number of moves from start to the closest cell with value goal, or None"""
+        open_bits = self.mask(cells != DANGER)
+        targets = self.mask(cells == goal)
+        region, steps = self.open_neighbors(cells, start), 1
+        while not region & targets:
+            grown = self.grow(region, open_bits)
+            if grown == region:
+                return None
+            region, steps = grown, steps + 1
+        return steps
+
+    def first_step(self, cells, start, goal=FOOD):
+        """Direction code of the first move on a shortest path to goal, or None"""
+        open_bits = self.mask(cells != DANGER)
+        region = self.mask(cells == goal)
+        next_to_start = self.open_neighbors(cells, start)
+        while not region & next_to_start:
+            grown = self.grow(region, open_bits)
+            if grown == region:
+                return None
+            region = grown
+        for nxt, direction in self.neighbors[start]:
+            if region & self.bit(nxt):
+                return direction
+        return None
+
+
+class MoveLanes:
+    """Four copies of a board stacked in one int, one per move"""
+    __slots__ = ("board", "lane_bits", "lane_mask")
+
+    def __init__(self, board):
+        self.board = board
+        self.lane_bits = (board.height + 1) * board.stride # Rows of a board and a padding row
+        self.lane_mask = (1 << self.lane_bits) - 1
+
+    def areas(self, state):
+        """Free cells the snake can reach after each move (by direction code),
+        or -1 for a move that hits the wall, the snake or an explosive"""
+        board, lane_bits = self.board, self.lane_bits
+        cells = state.board.cells
+        tail = state.body[-1]
+        open_bits = board.mask(cells != DANGER)
+
+        areas, heads, lanes_open = [-1] * 4, 0, 0
+        for direction in range(4):
+            head = state.next_cell(state.head, direction)
+            if head is None:
+                continue
+            ate = cells[head] == FOOD
+            if cells[head] == DANGER and not (head == tail and not ate):
+                continue
+            areas[direction] = 0
+
+            # Board after the move: the tail moves away unless the snake ate, the new head is taken
+            lane = open_bits
+            if not (ate and state.grows):
+                lane |= board.bit(tail)
+            lane &= ~board.bit(head)
+            lanes_open |= lane << direction * lane_bits
+            heads |= board.bit(head) << direction * lane_bits
+
+        if not heads:
+            return areas
+
+        # One flood fill for the four lanes (the padding rows keep them apart)
+        region = board.grow(heads, lanes_open)
+        stride = board.stride
+        while True:
+            grown = (region | region << 1 | region >> 1 | region << stride | region >> stride) & lanes_open
+            if grown == region:
+                break
+            region = grown
+
+        for direction in range(4):
+            if areas[direction] == 0:
+                areas[direction] = (region >> direction * lane_bits & self.lane_mask).bit_count()
+        return areas
+
+
+_bitboards = {} # One BitBoard per board size
+
+
+def get_bitboard(height, width):
+    """Shared BitBoard for boards of this size"""
+    if (height, width) not in _bitboards:
+        _bitboards[height, width] = BitBoard(height, width)
+    return _bitboards[height, width]
+
+
+_lanes = {} # One MoveLanes per board size
+
+
+def move_areas(state):
+    """Free cells the snake can reach after each of its four moves, by
+    direction code (-1 for moves that end the game at once)"""
+    if (state.height, state.width) not in _lanes:
+        _lanes[state.height, state.width] = MoveLanes(get_bitboard(state.height, state.width))
+    return _lanes[state.height, state.width].areas(state)
+
+
+def roomiest_move(state):
+    """Direction code of the move that leaves the snake the most room, or None if every move ends the game"""
+    areas = move_areas(state)
+    best = max(range(4), key=lambda direction: areas[direction])
+    return best if areas[best] >= 0 else None
+
+
+def with_fallback(policy):
+    """Policy that moves to the roomiest cell whenever policy finds no move"""
+    def choose_direction(state):
+        direction = policy(state)
+        return direction if direction is not None else roomiest_move(state)
+    return choose_direction
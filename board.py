@@ -0,0 +1,116 @@
+# PERSISTENT MATRIX OF THE GAME
+"""
+Values in matrix
+0 - empty cell
+1 - food
+2 - dangerous cells (snake's body and explosives)
+
+The board is built once per game and only the cells that change in a tick
+are written: the new head, the freed tail, the food and the explosives that
+spawn or time out. Cells are indices into the flattened matrix
+(row * width + col).
+
+The board also keeps an index of its empty cells: the first n_free entries
+of free are the empty cells and slot tells where each cell sits in free.
+Filling a cell swaps the last empty cell into its slot, so keeping the index
+up to date and drawing a random empty cell are both O(1).
+
+When dirty is a list, every changed cell is appended to it, so a renderer can
+redraw only those cells (see renderer.py). It is None by default, which keeps
+headless games from collecting cells nobody reads.
+"""
+import random
+import numpy as np
+
+from characters import win_height, win_width, to_cell
+
+EMPTY = 0
+FOOD = 1
+DANGER = 2
+
+
+class Board:
+    __slots__ = ("height", "width", "cells", "matrix", "rng", "free", "slot", "n_free", "dirty")
+
+    def __init__(self, height=win_height//10, width=win_width//10, seed=None):
+        self.height = height
+        self.width = width
+        self.cells = np.zeros(height * width, dtype=np.int8)
+        self.matrix = self.cells.reshape(height, width)  # View of cells
+        self.rng = random.Random(seed)
+
+        # Index of empty cells (every cell is empty at the start)
+        self.free = list(range(height * width))
+        self.slot = list(range(height * width))
+        self.n_free = height * width
+        self.dirty = None
+
+    @classmethod
+    def from_characters(cls, snake, food, explosive=None, seed=None):
+        """Builds the board of a game from its characters"""
+        board = cls(seed=seed)
+        for segment in snake.body:
+            board.occupy(to_cell(segment))
+        if explosive:
+            for explo in explosive.explosives:
+                board.occupy(to_cell(explo))
+        board.place_food(to_cell(food.position))
+        return board
+
+    def copy(self):
+        """Makes an independent copy of the board (including its random state)"""
+        board = Board.__new__(Board)
+        board.height, board.width = self.height, self.width
+        board.cells = self.cells.copy()
+        board.matrix = board.cells.reshape(self.height, self.width)
+        board.rng = random.Random()
+        board.rng.setstate(self.rng.getstate())
+        board.free = self.free.copy()
+        board.slot = self.slot.copy()
+        board.n_free = self.n_free
+        board.dirty = None
+        return board
+
+    def set(self, cell, value):
+        """Changes the value of a cell and keeps the index of empty cells up to date"""
+        if self.cells[cell] == EMPTY and value != EMPTY:
+            # Move the last empty cell into the slot of the filled cell
+            pos, last = self.slot[cell], self.free[self.n_free - 1]
+            self.free[pos] = last
+            self.slot[last] = pos
+            self.n_free -= 1
+        elif self.cells[cell] != EMPTY and value == EMPTY:
+            self.free[self.n_free] = cell
+            self.slot[cell] = self.n_free
+            self.n_free += 1
+        self.cells[cell] = value
+        if self.dirty is not None:
+            self.dirty.append(cell)
+
+    def take_dirty(self):
+        """Returns the cells changed since the last call and starts a new list"""
+        dirty, self.dirty = self.dirty, []
+        return dirty
+
+    def occupy(self, cell):
+        """Marks a cell as dangerous (snake's body or explosive)"""
+        self.set(cell, DANGER)
+
+    def release(self, cell):
+        """Marks a cell as empty"""
+        self.set(cell, EMPTY)
+
+    def place_food(self, cell):
+        """Marks a cell as food"""
+        self.set(cell, FOOD)
+
+    def random_empty_cell(self):
+        """Picks a uniformly random empty cell"""
+        return self.free[self.rng.randrange(self.n_free)]
+
+    def move_snake(self, head, tail=None):
+        """Applies one move of the snake: the tail cell is freed (unless food was
+        eaten) before the new head is occupied, so the head can follow the tail"""
+        if tail is not None:
+            self.release(tail)
+        self.occupy(head)
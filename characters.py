@@ -1,11 +1,21 @@
 # CLASSES OF THE CHARACTERS IN THE GAME
 import random
+from collections import deque
 
 # Set up display variables
 win_width = 800
 win_height = 600
 
-def find_empty_cell(matrix):
+def to_cell(position):
+    """Converts a position on the screen to the index of its cell in the matrix"""
+    return (position[1]//10)*(win_width//10) + position[0]//10
+
+def find_empty_cell(matrix=None, board=None):
+    # Boards keep an index of their empty cells (and their own random generator), so no scan is needed
+    if board is not None:
+        cell = board.random_empty_cell()
+        return (cell % board.width, cell // board.width)
+    
     empty_cells = []
     for r, row in enumerate(matrix):
         for c, col in enumerate(row):
@@ -16,44 +26,62 @@ def find_empty_cell(matrix):
     return rand_pos
 
 class Snake:
+    __slots__ = ("size", "body", "occupied", "direction")
+    
     def __init__(self):
         self.size = 10
-        self.body = [(400, 300)]
+        self.body = deque([(400, 300)])
+        self.occupied = {(400, 300): 1} # Number of segments on each position of the body
         self.direction = "RIGHT"
 
     def grow(self):
         """Adds one segment to the snake's body """
+        head = self.body[0]
         if self.direction == "UP":
-            self.body.insert(0, (self.body[0][0], self.body[0][1]-self.size))
+            head = (head[0], head[1]-self.size)
         elif self.direction == "DOWN":
-            self.body.insert(0, (self.body[0][0], self.body[0][1]+self.size))
+            head = (head[0], head[1]+self.size)
         elif self.direction == "RIGHT":
-            self.body.insert(0, (self.body[0][0]+self.size, self.body[0][1]))
+            head = (head[0]+self.size, head[1])
         else: # self.direction == "LEFT"
-            self.body.insert(0, (self.body[0][0]-self.size, self.body[0][1]))
+            head = (head[0]-self.size, head[1])
+        self.body.appendleft(head)
+        self.occupied[head] = self.occupied.get(head, 0) + 1
     
     def shrink(self):
         """Removes the last segment of the snake's body"""
-        self.body.pop()
+        tail = self.body.pop()
+        if self.occupied[tail] == 1:
+            del self.occupied[tail]
+        else:
+            self.occupied[tail] -= 1
+    
+    def bit_itself(self):
+        """Checks if the head of the snake is on another segment of its body"""
+        return self.occupied[self.body[0]] > 1
         
 class Food:
-    def __init__(self):
+    __slots__ = ("size", "position")
+    
+    def __init__(self, rng=random):
         self.size = 10
-        self.position = (random.randrange(1, win_width/10)*self.size, random.randrange(1, win_height/10)*self.size)
+        self.position = (rng.randrange(1, win_width//10)*self.size, rng.randrange(1, win_height//10)*self.size)
         
-    def spawn_new_food(self, matrix):
+    def spawn_new_food(self, matrix=None, board=None):
         """Spawns a new food at a random position on the map"""
-        new_food_pos = find_empty_cell(matrix=matrix)
+        new_food_pos = find_empty_cell(matrix=matrix, board=board)
         self.position = (new_food_pos[0]*self.size, new_food_pos[1]*self.size)
         
 class Explosive:
+    __slots__ = ("size", "explosives")
+    
     def __init__(self):
         self.size = 10
         self.explosives = []
         
-    def spawn_explosive(self, matrix):
+    def spawn_explosive(self, matrix=None, board=None):
         """Spawns a new explosive at a random position on the map"""
-        new_explosive_pos = find_empty_cell(matrix=matrix)
+        new_explosive_pos = find_empty_cell(matrix=matrix, board=board)
         new_explosive = (new_explosive_pos[0]*self.size, new_explosive_pos[1]*self.size)
         self.explosives.append(new_explosive)
         
@@ -24,10 +24,11 @@ food the bigger the number.
 8. Data is only taken on the every 3 iterations
 """
 
+import random
+import argparse
 import pygame
 import pickle
-import numpy as np
-from collections import deque
+from itertools import islice
 
 # Include top level modules
 import os, sys
@@ -43,22 +44,12 @@ from characters import (
     # Display variables
     win_height,
     win_width,
+    to_cell,
 )
-
-def update_matrix(curr_matrix, snakes, food, explosives):
-    """Update the position of characters in matrix"""
-    
-    # Update snakes's body and explostions in matrix
-    # Switch x and y because of numpy (height -> row, width -> column)
-    for pos in (snakes + explosives):
-        x, y = pos[0]//10, pos[1]//10
-        curr_matrix[y][x] = 2
-    
-    # Update food in matrix
-    x, y = food[0]//10, food[1]//10
-    curr_matrix[y][x] = 1  
-    
-    return curr_matrix
+from board import Board
+from state import DIRECTION_NAMES
+from bitboard import get_bitboard
+from cnn_players.features import decision_matrix
 
 def labeler(direction):
     # Change direction(string) to discrete value for labeling
@@ -70,112 +61,23 @@ def labeler(direction):
     }
     return converter[direction]
 
-def compute_distance(pos1, pos2):
-    """Helper function to calculate the distance between two points"""
-    return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-
 def get_decision_matrix(matrix, snake_head, food):
     """Decision matrix generator
     Update: Changing decision matrix to 5 by 5"""
-    h, w = len(matrix), len(matrix[0])
     food_pos = (food[1]//10, food[0]//10)
     snake_head_pos = (snake_head[1]//10, snake_head[0]//10)
-    open_paths = {}
-    res = np.zeros((5, 5))
-    
-    for i in range(5):
-        row = snake_head_pos[0] - 2 + i
-        for j in range(5):
-            col = snake_head_pos[1] - 2 + j
-            # Set walls to -15 in decision matrix
-            if (row < 0 or row >= h or col < 0 or col >= w):
-                res[i][j] = -10
-            # Set head of snake to 0 in decision matrix
-            elif (i == 3 and j == 3):
-                continue
-            # Set snake body and explosives to -10 in decision matrix
-            elif matrix[row][col] == 2:
-                res[i][j] = -10
-            # Set food to 10 in decision matrix
-            else:
-                if matrix[row][col] == 1:
-                    res[i][j] = 10
-                dist = compute_distance((row, col), food_pos)
-                if dist in open_paths:
-                    open_paths[dist].append((i, j))
-                else:
-                    open_paths[dist] = [(i, j)]
-    
-    # Sort the points in open path in descending order of their distance from the food
-    open_paths = dict(sorted(open_paths.items(), key=lambda item: item[0], reverse=True))
-    
-    # Create a gradient on the decision matrix to give a sense of direction to food
-    for order, key in enumerate(open_paths):
-        for points in open_paths[key]:
-            res[points[0]][points[1]] += order + 1
-        
-    return res
+    return decision_matrix(matrix, snake_head_pos, food_pos, size=5)
 
 def make_next_move(matrix, head, food):
     """Select next move of snake"""
-    
-    h, w = len(matrix), len(matrix[0])
-    visited = [[False for _ in range(w)] for _ in range(h)]
-    directions = [ 
-        {"name": "LEFT", "value": (0, -1)},
-        {"name": "UP", "value": (-1, 0)},
-        {"name": "RIGHT", "value": (0, 1)},
-        {"name": "DOWN", "value": (1, 0)}, 
-    ]
+    h, w = matrix.shape
     head = (head[1]//10, head[0]//10) # Scale position of head and reverse for numpy
-    food = (food[1]//10, food[0]//10) # Scale position of food and reverse for numpy
-    visited[head[0]][head[1]] = True # Mark the position of head as visited
-    queue = deque([[head]]) # Initialise queue unique paths with position of snake's head
-    
-    move = None
-    while queue:
-        path = queue.popleft()
-        curr = path[-1]
-        
-        # Stop searching and make move when food is found OR
-        if matrix[curr[0]][curr[1]] == 1:
-            move = path[1] # Set move to next step from head   
-            break
-        
-        # Find next possible moves
-        for d in directions:
-            
-            y, x = d["value"]
-            next_y, next_x = curr[0] + y, curr[1] + x
-            next_coord = (next_y, next_x)
-            
-            # Skip moves where snake crashes into wall
-            if (next_y < 0 or next_y >= h or next_x < 0 or next_x >= w):
-                continue
-            
-            # Skip moves where snake crashes into explosives or itself
-            if matrix[next_y][next_x] == 2:
-                continue
-            
-            # Skip nodes that have already been visited
-            if visited[next_y][next_x]:
-                continue
-        
-            queue.append(path + [next_coord])
-            visited[next_y][next_x] = True 
-           
-    if move:        
-        # Select direction 
-        move_pos = (move[0] - head[0], move[1] - head[1])
-        for d in directions:
-            if d["value"] == move_pos:
-                move = d["name"] # Change move to direction name
-                break   
-    return move
+    direction = get_bitboard(h, w).first_step(matrix.ravel(), head[0] * w + head[1])
+    return DIRECTION_NAMES[direction] if direction is not None else None
 
 
-def game_loop():
-    """Main game loop"""
+def game_loop(seed=None):
+    """Main game loop (seed decides the spawns of food and explosives of every game)"""
 
     # Constants
     SNAKE_SPEED = 30
@@ -197,8 +99,11 @@ def game_loop():
 
     score = 1
     snake = Snake()
-    food = Food()
+    rng = random.Random(seed)
+    food = Food(rng=rng)
     explosive = Explosive()
+    board = Board.from_characters(snake, food, explosive, seed=rng.getrandbits(64)) # The board draws the later spawns
+    matrix = board.matrix # Changes to the board show up in the matrix
 
     i = 0  # Iterator
     
@@ -207,18 +112,6 @@ def game_loop():
         if i == 30000:
             break
         
-        # Zero all cells in matrix
-        """
-        Values in matrix
-        0 - empty cell
-        1 - food
-        2 - dangerous cells (snake's body and explosives)
-        """
-        matrix = np.zeros((win_height//10, win_width//10))
-        
-        # Update cells of matrix
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
-        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -233,8 +126,10 @@ def game_loop():
             snake.direction = new_snake_direction
         else: # Reset game when no valid moves are found
             snake = Snake()
-            food = Food()
+            food = Food(rng=rng)
             explosive = Explosive()
+            board = Board.from_characters(snake, food, explosive, seed=rng.getrandbits(64))
+            matrix = board.matrix
             continue
         
         # Collect new data points into pickle file after every three iterations
@@ -250,28 +145,34 @@ def game_loop():
         snake.grow() 
         
         # Logic for eating food and spawning new one
-        if snake.body[0] == food.position:
+        ate = snake.body[0] == food.position
+        if ate:
             score += 1
-            food.spawn_new_food(matrix=matrix)
+            food.spawn_new_food(board=board)
         # If no food eaten, remove last segment of snake
         else: 
+            tail = snake.body[-1]
             snake.shrink()
             
-        # Update cells of matrix (effect change in food's position)
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
+        # Update cells of matrix (effect change in snake's and food's position)
+        board.move_snake(to_cell(snake.body[0]), None if ate else to_cell(tail))
+        if ate:
+            board.place_food(to_cell(food.position))
         
         # Logic for spawning explosives
         explosive_TIMER += 1
         if explosive_TIMER % 20 == 0: 
-            explosive.spawn_explosive(matrix=matrix)
+            explosive.spawn_explosive(board=board)
+            board.occupy(to_cell(explosive.explosives[-1]))
             
         # Logic for timing out explosives
         if explosive_TIMER % 200 == 0:
+            board.release(to_cell(explosive.explosives[0]))
             explosive.destroy_explosive(0)
             
         # Drawing snake, good food and explosives
         win.fill(BG_COLOR)
-        for segment in snake.body[1:]:
+        for segment in islice(snake.body, 1, None):
             pygame.draw.rect(win, SNAKE_COLOR, pygame.Rect(segment[0], segment[1], snake.size, snake.size))
         pygame.draw.rect(win, SNAKE_HEAD_COLOR, pygame.Rect(snake.body[0][0], snake.body[0][1], snake.size, snake.size))
         pygame.draw.rect(win, FOOD_COLOR, pygame.Rect(food.position[0], food.position[1], food.size, food.size))
@@ -298,4 +199,6 @@ def game_loop():
 
 # Command to run game
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collect the training data of the big snake from the BFS player")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random spawns")
+    game_loop(seed=parser.parse_args().seed)
\ No newline at end of file
@@ -0,0 +1,104 @@
+# DECISION MATRICES OF THE CNN PLAYERS
+"""
+A decision matrix is the size x size window of the board around the head:
+
+    -10     for cells outside the board, snake cells and explosives
+    rank    for open cells, the rank of their distance to the food among the
+            distinct distances of the open cells of the window, from 1 for
+            the farthest up
+    10+rank for the food
+    0       for the cell at (3, 3) (the head of a 7 by 7 window; the 5 by 5
+            models were trained with this cell skipped as well, so it stays)
+
+decision_matrix builds the window of one head (what the players and the data
+collector need every tick) from the list of its cells. decision_matrices
+builds the windows of a whole batch of heads at once: the
+windows are gathered from the boards with one fancy index (clipped at the
+edges, then marked as outside), the distances are broadcast from the rows
+and columns of the windows, and the ranks of every window come from one
+np.unique over all of them.
+"""
+import numpy as np
+
+from board import FOOD, DANGER
+
+OUTSIDE = 3 # Cells of a window outside the board
+SKIPPED = (3, 3) # Cell of the window that is always 0 (unless it is outside the board)
+
+
+def decision_matrices(boards, heads, foods, size=5):
+    """Decision matrices of shape (n, size, size) for n heads and foods ((row, col) positions);
+    boards is one board of shape (rows, cols) for all of them or one per head"""
+    boards = np.asarray(boards)
+    heads, foods = np.asarray(heads).reshape(-1, 2), np.asarray(foods).reshape(-1, 2)
+    n, pad = len(heads), size // 2
+    if boards.ndim == 2:
+        boards = boards[np.newaxis]
+    rows, cols = boards.shape[1:]
+
+    # Rows and columns of the window of every head, and the window read from the boards
+    # (cells outside the board read a clipped cell and are then marked OUTSIDE)
+    offsets = np.arange(size) - pad
+    window_rows = heads[:, 0, np.newaxis] + offsets
+    window_cols = heads[:, 1, np.newaxis] + offsets
+    window = boards[
+        (np.arange(n) % len(boards))[:, np.newaxis, np.newaxis],
+        np.minimum(np.maximum(window_rows, 0), rows - 1)[:, :, np.newaxis],
+        np.minimum(np.maximum(window_cols, 0), cols - 1)[:, np.newaxis, :],
+    ]
+    row_outside = (window_rows < 0) | (window_rows >= rows)
+    col_outside = (window_cols < 0) | (window_cols >= cols)
+    window[row_outside[:, :, np.newaxis] | col_outside[:, np.newaxis, :]] = OUTSIDE
+
+    # Distance of every cell of the windows to the food
+    row_distance = np.abs(window_rows - foods[:, 0, np.newaxis])
+    col_distance = np.abs(window_cols - foods[:, 1, np.newaxis])
+    distance = row_distance[:, :, np.newaxis] + col_distance[:, np.newaxis, :]
+
+    skipped = np.zeros((size, size), dtype=bool)
+    if max(SKIPPED) < size:
+        skipped[SKIPPED] = True
+    outside = window == OUTSIDE
+    blocked = outside | ((window == DANGER) & ~skipped)
+    is_open = ~blocked & ~skipped
+
+    # Rank of the distances within each window: sort (window, -distance) keys of the open cells
+    # and count from the first key of the window
+    span = rows + cols + 2 * size # More than any distance
+    first_key = np.nonzero(is_open)[0] * span # Window of every open cell
+    unique, rank = np.unique(first_key + (span - 1 - distance[is_open]), return_inverse=True)
+    rank = rank.ravel() - np.searchsorted(unique, first_key) + 1
+
+    res = np.zeros(window.shape)
+    res[blocked] = -10
+    res[is_open] = rank + 10 * (window[is_open] == FOOD)
+    return res
+
+
+def decision_matrix(board, head, food, size=5):
+    """Decision matrix of one head and food ((row, col) positions)
+    A single window is too small for array operations to pay off (their overhead is most of
+    the cost), so it is built from a list of the window's cells"""
+    rows, cols = len(board), len(board[0])
+    pad = size // 2
+    top, left = head[0] - pad, head[1] - pad
+    first_row, first_col = max(top, 0), max(left, 0)
+    window = np.asarray(board)[first_row:top + size, first_col:left + size].tolist()
+
+    res = [[-10.0] * size for _ in range(size)]
+    open_cells = [] # (distance, i, j, value) of the open cells
+    for i in range(max(-top, 0), min(rows - top, size)):
+        line = window[top + i - first_row]
+        for j in range(max(-left, 0), min(cols - left, size)):
+            if (i, j) == SKIPPED:
+                res[i][j] = 0.0
+                continue
+            value = line[left + j - first_col]
+            if value != DANGER:
+                open_cells.append((abs(top + i - food[0]) + abs(left + j - food[1]), i, j, value))
+
+    # Rank of every distance, from 1 for the farthest
+    ranks = {distance: rank for rank, distance in enumerate(sorted({cell[0] for cell in open_cells}, reverse=True), 1)}
+    for distance, i, j, value in open_cells:
+        res[i][j] = ranks[distance] + (10 if value == FOOD else 0)
+    return np.array(res)
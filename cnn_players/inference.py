@@ -0,0 +1,250 @@
+# INFERENCE RUNTIMES FOR THE CNN PLAYERS
+"""
+The players predict one matrix per tick, and model.predict builds a new
+input pipeline on every call, which costs milliseconds for a forward pass of
+a few thousand multiply-adds. There are two faster runtimes:
+
+    CompiledModel traces the Keras model once into a tf.function and calls
+    it directly.
+
+    NumpyModel runs the same forward pass with NumPy from the weights in the
+    .h5 file, so a player starts in milliseconds without importing
+    TensorFlow. A convolution lays the sliding windows of the input out as
+    rows of a matrix (im2col) and multiplies them with the kernels at once.
+
+Every shipped model is Conv2D(3x3, relu), MaxPooling2D(2x2), Conv2D(relu),
+Flatten, Dense(64, relu), Dense(4, softmax). The softmax keeps the order of
+the outputs, so both runtimes take the argmax of the outputs before it. The
+classes are the direction codes (0 -> UP, 1 -> RIGHT, 2 -> DOWN, 3 -> LEFT).
+
+CachedModel remembers the moves of the most recently seen matrices: the
+decision matrices only hold a few distinct values, and games keep running
+into the same local patterns. Both runtimes are deterministic, so a cached
+move is exactly the move the model would predict again.
+
+Check the NumPy runtime against Keras outputs saved in golden_outputs.npz
+(no TensorFlow needed), against Keras itself, or save new outputs:
+    python3 -m cnn_players.inference [--keras] [--save-golden]
+"""
+import os
+import abc
+import time
+import argparse
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Random matrices and the outputs of the Keras models for them, saved with --save-golden
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'golden_outputs.npz')
+
+
+class Model(abc.ABC):
+    """Predicted classes of a runtime, with the latency of its calls
+    (a runtime overrides classes)"""
+    __slots__ = ("calls", "seconds", "slowest")
+
+    def __init__(self):
+        self.calls, self.seconds, self.slowest = 0, 0.0, 0.0
+
+    @abc.abstractmethod
+    def classes(self, matrices):
+        """Predicted classes of a float32 batch of shape (n, rows, cols)"""
+
+    def predict(self, matrices):
+        """Predicted classes of a batch of matrices of shape (n, rows, cols)"""
+        start = time.perf_counter()
+        classes = self.classes(np.asarray(matrices, dtype=np.float32))
+        elapsed = time.perf_counter() - start
+        self.calls += 1
+        self.seconds += elapsed
+        self.slowest = max(self.slowest, elapsed)
+        return classes
+
+    def direction(self, matrix):
+        """Direction code predicted for one matrix"""
+        return int(self.predict(matrix[np.newaxis])[0])
+
+    def report(self):
+        """Latency of the calls so far"""
+        if not self.calls:
+            return "Inference: no calls"
+        return (
+            f"Inference: {self.calls} calls, {self.seconds / self.calls * 1e6:.0f} us average, "
+            f"{self.slowest * 1e6:.0f} us slowest"
+        )
+
+
+class CompiledModel(Model):
+    """Traced forward pass of a Keras model"""
+    __slots__ = ("forward",)
+
+    def __init__(self, model):
+        import tensorflow as tf
+
+        super().__init__()
+        spec = tf.TensorSpec((None, *model.input_shape[1:]), tf.float32)
+
+        @tf.function(input_signature=[spec])
+        def forward(matrices):
+            return tf.argmax(model(matrices, training=False), axis=-1, output_type=tf.int32)
+
+        self.forward = forward
+        self.forward(tf.zeros((1, *model.input_shape[1:]))) # Trace now, not on the first tick
+
+    def classes(self, matrices):
+        return self.forward(matrices[..., np.newaxis]).numpy()
+
+
+def load_weights(path):
+    """Kernels and biases of the layers with weights in a Keras .h5 file, in layer order"""
+    import h5py
+
+    weights = []
+    with h5py.File(path, "r") as f:
+        for name in f.attrs["layer_names"]:
+            group = f[name]
+            names = [n.decode() if isinstance(n, bytes) else n for n in group.attrs["weight_names"]]
+            if names:
+                kernel, bias = (np.asarray(group[n], dtype=np.float32) for n in names)
+                weights.append((kernel, bias))
+    return weights
+
+
+def convolve(x, kernel, bias):
+    """Valid convolution with relu of a batch of shape (n, rows, cols, channels)"""
+    windows = sliding_window_view(x, kernel.shape[:2], axis=(1, 2)) # (n, rows', cols', channels, rows, cols)
+    n, out_rows, out_cols = windows.shape[:3]
+    columns = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * out_rows * out_cols, -1) # In kernel order
+    out = columns @ kernel.reshape(len(columns[0]), -1) + bias
+    return np.maximum(out, 0).reshape(n, out_rows, out_cols, -1)
+
+
+def max_pool(x):
+    """2x2 max pooling (odd last rows and columns are dropped, like Keras)"""
+    n, rows, cols, channels = x.shape
+    rows, cols = rows // 2, cols // 2
+    return x[:, :rows * 2, :cols * 2].reshape(n, rows, 2, cols, 2, channels).max(axis=(2, 4))
+
+
+class NumpyModel(Model):
+    """Forward pass of a shipped model with NumPy"""
+    __slots__ = ("layers",)
+
+    def __init__(self, path):
+        super().__init__()
+        self.layers = load_weights(path)
+
+    def outputs(self, matrices):
+        """Outputs of the last layer before the softmax for a float32 batch of shape (n, rows, cols)"""
+        (conv1, bias1), (conv2, bias2), (dense1, bias3), (dense2, bias4) = self.layers
+        x = max_pool(convolve(matrices[..., np.newaxis], conv1, bias1))
+        x = convolve(x, conv2, bias2).reshape(len(matrices), -1) # Flatten in (row, col, channel) order
+        x = np.maximum(x @ dense1 + bias3, 0)
+        return x @ dense2 + bias4
+
+    def probabilities(self, matrices):
+        """Outputs of the model (after the softmax)"""
+        outputs = self.outputs(np.asarray(matrices, dtype=np.float32))
+        outputs = np.exp(outputs - outputs.max(axis=1, keepdims=True))
+        return outputs / outputs.sum(axis=1, keepdims=True)
+
+    def classes(self, matrices):
+        return self.outputs(matrices).argmax(axis=1)
+
+
+class CachedModel:
+    """LRU cache of the moves of a runtime, keyed by the bytes of the matrix"""
+    __slots__ = ("model", "size", "moves", "hits", "misses", "evictions")
+
+    def __init__(self, model, size=4096):
+        self.model = model
+        self.size = size
+        self.moves = OrderedDict() # Least recently used first
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def direction(self, matrix):
+        """Direction code predicted for one matrix"""
+        key = matrix.tobytes()
+        direction = self.moves.get(key)
+        if direction is not None:
+            self.moves.move_to_end(key)
+            self.hits += 1
+            return direction
+
+        direction = self.model.direction(matrix)
+        self.misses += 1
+        self.moves[key] = direction
+        if len(self.moves) > self.size:
+            self.moves.popitem(last=False)
+            self.evictions += 1
+        return direction
+
+    def report(self):
+        """Hit rate of the cache and latency of the runtime"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return (
+            f"Cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+            f"{self.evictions} evictions of {self.size} entries\n{self.model.report()}"
+        )
+
+
+def shipped_models():
+    """(name, Keras loader, weights path, input shape) of every shipped model"""
+    from cnn_players.big_snake.main import MODELS, load_model, weights_path
+    from cnn_players.small_snake import main as small_snake
+
+    models = [(name, lambda name=name: load_model(name), weights_path(name), (MODELS[name][1],) * 2) for name in MODELS]
+    models.append((
+        "cnn_small", small_snake.load_model, small_snake.weights_path(),
+        (small_snake.GAME_HEIGHT, small_snake.GAME_WIDTH),
+    ))
+    return models
+
+
+def check_parity(samples=1000, seed=0):
+    """Compare the NumPy runtime with Keras on random matrices for every shipped model"""
+    rng = np.random.default_rng(seed)
+    for name, load_keras, path, shape in shipped_models():
+        matrices = rng.integers(-10, 20, size=(samples, *shape)).astype(np.float32)
+        expected = load_keras().predict(matrices[..., np.newaxis], verbose=0)
+        actual = NumpyModel(path).probabilities(matrices)
+        error = np.abs(actual - expected).max()
+        agree = (actual.argmax(axis=1) == expected.argmax(axis=1)).mean()
+        print(f"{name}: largest difference {error:.2e}, same move in {agree:.1%} of {samples} matrices")
+
+
+def save_golden(samples=64, seed=0):
+    """Saves random matrices and the Keras outputs for them of every shipped model to GOLDEN_PATH"""
+    rng = np.random.default_rng(seed)
+    arrays = {}
+    for name, load_keras, _, shape in shipped_models():
+        matrices = rng.integers(-10, 20, size=(samples, *shape)).astype(np.float32)
+        arrays[f"{name}_matrices"] = matrices
+        arrays[f"{name}_outputs"] = load_keras().predict(matrices[..., np.newaxis], verbose=0)
+    np.savez_compressed(GOLDEN_PATH, **arrays)
+
+
+def check_golden(tolerance=1e-5):
+    """Compares the NumPy runtime with the saved Keras outputs (no TensorFlow needed)"""
+    golden = np.load(GOLDEN_PATH)
+    for name, _, path, _ in shipped_models():
+        matrices, expected = golden[f"{name}_matrices"], golden[f"{name}_outputs"]
+        actual = NumpyModel(path).probabilities(matrices)
+        error = np.abs(actual - expected).max()
+        assert error < tolerance, f"{name}: NumPy and Keras outputs differ by {error:.2e}"
+        assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all(), f"{name}: NumPy and Keras moves differ"
+        print(f"{name}: largest difference {error:.2e} over {len(matrices)} saved Keras outputs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the NumPy runtime against Keras")
+    parser.add_argument("--keras", action="store_true", help="compare with Keras itself (needs TensorFlow)")
+    parser.add_argument("--save-golden", action="store_true", help="save new Keras outputs to check against (needs TensorFlow)")
+    args = parser.parse_args()
+    if args.save_golden:
+        save_golden()
+    if args.keras:
+        check_parity()
+    else:
+        check_golden()
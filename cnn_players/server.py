@@ -0,0 +1,178 @@
+# INFERENCE SERVER FOR THE CNN PLAYERS
+"""
+One process loads every CNN model once and predicts the moves of the games
+of many worker processes in batches.
+
+The workers put (client, model, matrices) requests on one shared queue and
+wait for their classes on their own reply queue. The server takes the first
+request, then keeps collecting requests until it has MAX_BATCH of them or
+MAX_LATENCY has passed since the first one, predicts the matrices of each
+model in one forward pass and sends every worker its classes.
+
+A worker only has one request in flight (it waits for its move before the
+next tick), so the batches are as large as the number of workers at most.
+
+If the server can't load a model or a forward pass fails, it answers every
+request with the InferenceError, so the workers raise it instead of waiting
+forever; a worker whose server stopped answering gives up after
+REPLY_TIMEOUT.
+
+Usage (what tournament.py --server does):
+    server = InferenceServer(["cnn_5by5"], clients=workers)
+    ProcessPoolExecutor(workers, initializer=connect, initargs=server.client_args())
+    ...  # In the workers: make_policy("cnn_5by5", remote_model("cnn_5by5"))
+    server.close()
+"""
+import time
+import queue
+import multiprocessing as mp
+import numpy as np
+
+from cnn_players.inference import Model
+
+MAX_BATCH = 64
+MAX_LATENCY = 0.0005 # Seconds the first request of a batch waits for others
+REPLY_TIMEOUT = 60 # Seconds a worker waits for its classes before giving up on the server
+
+
+class InferenceError(RuntimeError):
+    """The inference server failed to load its models or to predict"""
+
+
+def load(name, runtime="numpy"):
+    """Runtime of the model of a CNN player"""
+    if name == "cnn_small":
+        from cnn_players.small_snake.main import load_runtime
+        return load_runtime(runtime)
+    from cnn_players.big_snake.main import load_runtime
+    return load_runtime(name, runtime)
+
+
+def answer(models, batch):
+    """Classes of every request of a batch, by client (one forward pass per model)"""
+    requests = {}
+    for client, name, matrices in batch:
+        requests.setdefault(name, []).append((client, matrices))
+    answers = {}
+    for name, mine in requests.items():
+        classes = models[name].predict(np.concatenate([matrices for _, matrices in mine]))
+        start = 0
+        for client, matrices in mine:
+            answers[client] = classes[start:start + len(matrices)]
+            start += len(matrices)
+    return answers
+
+
+def serve(requests, replies, stats, names, runtime, max_batch, max_latency):
+    """Loop of the server process (until a None request)
+    Once loading or predicting fails, every request is answered with the InferenceError"""
+    error = None
+    try:
+        models = {name: load(name, runtime) for name in names}
+    except Exception as exc:
+        error = InferenceError(f"loading the models failed: {exc!r}")
+    batches, samples = 0, 0
+    running = True
+    while running:
+        batch = [requests.get()]
+        if batch[0] is None:
+            break
+
+        # Collect requests until the batch is full or its first request has waited long enough
+        deadline = time.perf_counter() + max_latency
+        while len(batch) < max_batch:
+            try:
+                request = requests.get(timeout=max(0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if request is None:
+                running = False
+                break
+            batch.append(request)
+
+        # Every client gets either its classes or the error
+        if error is None:
+            try:
+                answers = answer(models, batch)
+            except Exception as exc:
+                error = InferenceError(f"inference failed: {exc!r}")
+        if error is not None:
+            answers = {client: error for client, _, _ in batch}
+        for client, reply in answers.items():
+            replies[client].put(reply)
+        batches += 1
+        samples += len(batch)
+    stats.put((batches, samples, error))
+
+
+class InferenceServer:
+    """Process that predicts the moves of the CNN players of clients worker processes"""
+    __slots__ = ("requests", "replies", "slots", "stats", "process")
+
+    def __init__(self, names, clients, runtime="numpy", max_batch=MAX_BATCH, max_latency=MAX_LATENCY):
+        self.requests = mp.Queue()
+        self.replies = [mp.Queue() for _ in range(clients)]
+        self.slots = mp.Queue() # Reply queues not taken by a worker yet
+        for client in range(clients):
+            self.slots.put(client)
+        self.stats = mp.Queue()
+        self.process = mp.Process(
+            target=serve, daemon=True,
+            args=(self.requests, self.replies, self.stats, list(names), runtime, min(max_batch, clients), max_latency),
+        )
+        self.process.start()
+
+    def client_args(self):
+        """Arguments of connect in the worker processes"""
+        return self.requests, self.replies, self.slots
+
+    def close(self):
+        """Stops the server and returns the number of batches and of requests it served
+        (raises InferenceError if the server failed or died)"""
+        self.requests.put(None)
+        while True:
+            try:
+                batches, samples, error = self.stats.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise InferenceError(f"the inference server exited with code {self.process.exitcode}")
+        self.process.join()
+        if error is not None:
+            raise error
+        return batches, samples
+
+
+_connection = None # (requests, replies, client) of this worker process
+
+
+def connect(requests, replies, slots):
+    """Connects this worker process to the server (initializer of the worker pool)"""
+    global _connection
+    client = slots.get()
+    _connection = (requests, replies[client], client)
+
+
+class RemoteModel(Model):
+    """Model of a CNN player that runs in the inference server"""
+    __slots__ = ("name", "requests", "replies", "client")
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.requests, self.replies, self.client = _connection
+
+    def classes(self, matrices):
+        self.requests.put((self.client, self.name, matrices))
+        try:
+            reply = self.replies.get(timeout=REPLY_TIMEOUT)
+        except queue.Empty:
+            raise InferenceError(f"no answer from the inference server in {REPLY_TIMEOUT} s") from None
+        if isinstance(reply, InferenceError):
+            raise reply
+        return reply
+
+
+def remote_model(name):
+    """Model of a CNN player in the inference server, or None when this process isn't connected"""
+    return RemoteModel(name) if _connection else None
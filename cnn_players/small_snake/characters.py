@@ -5,17 +5,19 @@ import random
 win_width = 80
 win_height = 60
 
-def find_empty_cell(matrix):
+def find_empty_cell(matrix, rng=random):
     empty_cells = []
     for r, row in enumerate(matrix):
         for c, col in enumerate(row):
             if col == 0:
                 empty_cells.append((c, r))
                 
-    rand_pos = random.choice(empty_cells)
+    rand_pos = rng.choice(empty_cells)
     return rand_pos
 
 class Snake:
+    __slots__ = ("size", "body", "direction")
+    
     def __init__(self):
         self.size = 10
         self.body = [(40, 30)]
@@ -37,11 +39,13 @@ class Snake:
         self.body.pop()
         
 class Food:
-    def __init__(self):
+    __slots__ = ("size", "position")
+    
+    def __init__(self, rng=random):
         self.size = 10
-        self.position = (random.randrange(1, win_width/10)*self.size, random.randrange(1, win_height/10)*self.size)
+        self.position = (rng.randrange(1, win_width//10)*self.size, rng.randrange(1, win_height//10)*self.size)
         
-    def spawn_new_food(self, matrix):
+    def spawn_new_food(self, matrix, rng=random):
         """Spawns a new food at a random position on the map"""
-        new_food_pos = find_empty_cell(matrix=matrix)
+        new_food_pos = find_empty_cell(matrix=matrix, rng=rng)
         self.position = (new_food_pos[0]*self.size, new_food_pos[1]*self.size)
\ No newline at end of file
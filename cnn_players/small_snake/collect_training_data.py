@@ -18,6 +18,8 @@ ML Information:
 6. Paths in the matrix are 0.
 """
 
+import random
+import argparse
 import pygame
 import pickle
 import numpy as np
@@ -111,8 +113,8 @@ def make_next_move(matrix, head, food):
                 break   
     return move
    
-def game_loop():
-    """Main game loop"""
+def game_loop(seed=None):
+    """Main game loop (seed decides the spawns of food)"""
 
     # Constants
     SNAKE_SPEED = 24
@@ -130,7 +132,8 @@ def game_loop():
 
     score = 1
     snake = Snake() # Spawns snake at level 1
-    food = Food() # Initiates with no food at random position; could be position of snake but what are the chances :) 
+    rng = random.Random(seed)
+    food = Food(rng=rng) # Initiates with no food at random position; could be position of snake but what are the chances :) 
     
     m = 0  # Space of the training set
     
@@ -172,7 +175,7 @@ def game_loop():
         # Logic for eating food and spawning new one
         if snake.body[0] == food.position:
             score += 1
-            food.spawn_new_food(matrix=matrix)
+            food.spawn_new_food(matrix=matrix, rng=rng)
             
         # Remove last segment whether food is eaten or not. 
         # To prevent snake from growing
@@ -197,4 +200,6 @@ def game_loop():
 
 # Command to run game
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collect the training data of the small snake from the BFS player")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random spawns")
+    game_loop(seed=parser.parse_args().seed)
\ No newline at end of file
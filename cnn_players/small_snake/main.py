@@ -1,93 +1,53 @@
-import pygame
 import numpy as np
-import tensorflow as tf
-from datetime import datetime
-from tensorflow.keras import models, layers
-
-from characters import (
-    # Characters
-    Snake, 
-    Food, 
-        
-    # Display variables
-    win_height,
-    win_width,
-)
 
 # Get absolute path of current directory
-import os
+import os, sys
 current_dir = os.path.dirname(__file__)
 
+# Include top level modules (ahead of small_snake/characters.py, whose
+# screen size only applies to the data collector)
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..', '..')))
+
+from state import GameState, DIRECTION_NAMES
+from cnn_players.inference import CompiledModel, NumpyModel
+from runner import play, parse_args, timing_options
+from records import append_record
+
+SNAKE_SPEED = 20
+FOOD_COLOR = (0, 0, 255)
+GAME_HEIGHT, GAME_WIDTH = 6, 8 # Screen of 60 by 80 in cells of 10
+RUNTIMES = ("numpy", "tensorflow") # Forward pass with NumPy or a traced TensorFlow function
+
 steps = 0 # Track the number of steps taken by the snake
 
 def update_matrix(matrix, snake, food):
-    """Update the position of characters in matrix"""
+    """Update the position of characters in matrix (snake and food are (row, col) positions)"""
     
     # Update snake on matrix
-    matrix[snake[1]//10][snake[0]//10] = 11
+    matrix[snake[0]][snake[1]] = 11
     
     # Update food in matrix
-    matrix[food[1]//10][food[0]//10] = 6 
+    matrix[food[0]][food[1]] = 6 
     
     return matrix
 
 def update_record(score):
     """Log the stats of the most recent game"""
-    current_time = datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-    record = f"\ncnn_small,{score},{steps},{steps//score},{current_time}"
-    logger_file_path = os.path.abspath(os.path.join(current_dir, '..', '..', 'logger.csv'))
-    with open(logger_file_path, 'a') as f:
-        f.write(record)
-    return None
+    append_record("cnn_small", score, steps)
 
 def make_next_move(model, matrix):
-    # Predicted move converter
-    converter = {
-        0: "UP",
-        1: "RIGHT",
-        2: "DOWN",
-        3: "LEFT"
-    }
-    
-    # Add extra dimension to matrix
-    matrix = np.expand_dims(matrix, axis=(0, -1)) # resulting shape will be (1, 6, 8, 1)
-    
-    # Now you can use your model to make predictions
-    predictions = model.predict(matrix)
-    
-    # The output is a batch of logits for each class, so let's take the first (and only) output
-    output = predictions[0]
-    
-    # Convert logits to probabilities
-    probabilities = tf.nn.softmax(output).numpy()
-
-    # Get class with the highest probability as models class
-    predicted_class = np.argmax(probabilities)
-    return converter[predicted_class]
+    """Predicted move of the model runtime for the 6 by 8 matrix"""
+    return DIRECTION_NAMES[model.direction(matrix)]
    
-def game_loop():
-    """Main game loop"""
-
-    # Constants
-    SNAKE_SPEED = 20
-    SNAKE_COLOR = (255, 255, 255)
-    FOOD_COLOR = (0, 0, 255)
-    BG_COLOR = (0, 0, 0)
-    TEXT_COLOR = (255, 255, 255)
-    global steps
+def weights_path():
+    """Path of the weights file of the model"""
+    return os.path.abspath(os.path.join(current_dir, 'static', 'weights.h5'))
 
-    # Set up game clock
-    clock = pygame.time.Clock()
 
-    # Initialize Pygame
-    pygame.init()
-    win = pygame.display.set_mode((win_width, win_height))
+def load_model():
+    """Recreate the exact same model architecture and load its weights"""
+    from tensorflow.keras import models, layers
 
-    score = 1
-    snake = Snake()
-    food = Food()
-    
-    # Recreate the exact same model architecture
     model = models.Sequential()
     model.add(layers.Conv2D(32, (3, 3), activation='relu', input_shape=(6, 8, 1)))
     model.add(layers.MaxPooling2D((2, 2)))
@@ -97,67 +57,58 @@ def game_loop():
     model.add(layers.Dense(4, activation='softmax'))
 
     # Load the weights
-    model.load_weights(os.path.abspath(os.path.join(current_dir, 'static', 'weights.h5')))
+    model.load_weights(weights_path())
+    return model
+
+
+def load_runtime(runtime="numpy"):
+    """Model that predicts the moves of the small CNN player with the given runtime"""
+    if runtime == "tensorflow":
+        return CompiledModel(load_model())
+    return NumpyModel(weights_path())
+
+
+def new_game(seed=None):
+    """The small snake doesn't grow and there are no explosives"""
+    return GameState(GAME_HEIGHT, GAME_WIDTH, seed=seed, grows=False, has_explosives=False)
+
+
+def make_policy(model=None):
+    """Policy of the small CNN player (model is its runtime, if already loaded)"""
+    if model is None:
+        model = load_runtime()
     
-    while True:
-        # Create new matrix
-        """
-        Values in matrix
-        0 - empty cell
-        1 - food
-        2 - dangerous cells (snake's body and explosives)
-        """
-        matrix = np.zeros((win_height//10, win_width//10))
-        
-        # Update cells of matrix
-        matrix = update_matrix(matrix, snake.body[0], food.position)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                
+    def choose_direction(state):
         # Predict the next move with weights of cnn model
-        snake.direction = make_next_move(model=model, matrix=matrix)
-
-        # Move the snake
-        steps += 1
-        snake.grow() 
-            
-        # Logic for eating food and spawning new one
-        if snake.body[0] == food.position:
-            score += 1
-            food.spawn_new_food(matrix=matrix)
-            
-        # Check if the snake has hit a wall
-        if (snake.body[0][0] not in range(0, win_width) or
-            snake.body[0][1] not in range(0, win_height)):
-            update_record(score)
-            break
-            
-        # Remove last segment whether food is eaten or not. 
-        # to prevent the snake from growing
-        snake.shrink()
-            
-        # Update cells of matrix (effect change in food's position)
-        matrix = update_matrix(matrix, snake.body[0], food.position)
-            
-        # Drawing snake and food
-        win.fill(BG_COLOR)
-        pygame.draw.rect(win, SNAKE_COLOR, pygame.Rect(snake.body[0][0], snake.body[0][1], snake.size, snake.size))
-        pygame.draw.rect(win, FOOD_COLOR, pygame.Rect(food.position[0], food.position[1], food.size, food.size))
-
-        pygame.display.update()
-        clock.tick(SNAKE_SPEED)
+        matrix = update_matrix(
+            np.zeros((state.height, state.width)),
+            divmod(state.head, state.width),
+            divmod(state.food, state.width),
+        )
+        return model.direction(matrix)
     
-    # Display final scores
-    print(f"SCORE: {score}")
-    pygame.display.update()
-    pygame.time.delay(5000) # Display final score for 5 seconds
+    return choose_direction
+
+
+def game_loop(headless=False, seed=None, replay_path=None, speed=SNAKE_SPEED, runtime="numpy", **display_options):
+    """Main game loop"""
+    global steps
     
-    # End game
-    pygame.quit()
+    model = load_runtime(runtime)
+    state = play(
+        make_policy(model), headless=headless, speed=speed, state=new_game(seed), replay_path=replay_path,
+        food_color=FOOD_COLOR, show_score=False, **display_options,
+    )
+    steps = state.steps
+    print(f"SCORE: {state.score}")
+    print(model.report())
+    update_record(state.score)
 
 
 # Command to run game
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    args = parse_args("Small snake played by the 6 by 8 CNN", runtimes=RUNTIMES)
+    game_loop(
+        headless=args.headless, seed=args.seed, replay_path=args.replay, runtime=args.runtime,
+        **timing_options(args, SNAKE_SPEED),
+    )
@@ -0,0 +1,245 @@
+# HEADLESS BATCH ENGINE
+"""
+Steps many games of snake at once without a window.
+
+Every game in the batch follows the same rules as the game loops:
+1. The snake moves one cell per tick (Snake.grow) and loses its last
+segment unless it ate the food (Snake.shrink).
+2. Eaten food respawns on a random empty cell (Food.spawn_new_food).
+3. An explosive spawns on a random empty cell every 20 ticks and the oldest
+one times out every 200 ticks (Explosive.spawn_explosive).
+4. A game ends when the snake hits a wall, itself or an explosive.
+
+The games are stored as stacked NumPy arrays so one call to step() advances
+all of them together. Cells are flat indices (row * width + col) and
+directions are small ints in the same order the CNN players label them.
+
+Like Board, every game keeps an index of its empty cells (a dense array with
+swap removal) so food and explosives spawn in O(1) instead of scanning the grid.
+
+Like GameState, every game owns its random numbers: the k-th draw of a game
+is splitmix64 of its seed and k, so the draws of all games are made with the
+same array operations and stay independent of the other games. Each new game
+draws its seed from the generator of the batch (seeded with seed) and keeps
+it in game_seeds, so any game can be played again with reset(games, seeds).
+"""
+import numpy as np
+
+from characters import win_height, win_width
+from board import EMPTY, FOOD, DANGER
+from state import (
+    RIGHT,
+    DIRECTION_STEPS,
+    EXPLOSIVE_SPAWN_RATE,
+    EXPLOSIVE_TIMEOUT_RATE,
+)
+
+# Constants of splitmix64
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+ROW_STEP = np.array([step[0] for step in DIRECTION_STEPS])
+COL_STEP = np.array([step[1] for step in DIRECTION_STEPS])
+
+
+class BatchEngine:
+    def __init__(self, n_games, height=win_height//10, width=win_width//10, seed=None):
+        self.n_games = n_games
+        self.height = height
+        self.width = width
+        self.n_cells = height * width
+        self.seed_rng = np.random.default_rng(seed) # Draws the seed of every new game
+        self.game_seeds = np.zeros(n_games, dtype=np.uint64)
+        self.draws = np.zeros(n_games, dtype=np.uint64) # Random numbers drawn by every game
+
+        n, c = n_games, self.n_cells
+        self.grid = np.zeros((n, c), dtype=np.int8)
+
+        # Index of empty cells: the first n_free entries of free are the empty
+        # cells of a game and slot tells where each cell sits in free
+        self.free = np.zeros((n, c), dtype=np.int32)
+        self.slot = np.zeros((n, c), dtype=np.int32)
+        self.n_free = np.zeros(n, dtype=np.int32)
+
+        # Snake bodies are ring buffers; the head sits at head_ptr and the
+        # tail sits length - 1 slots behind it
+        self.body = np.zeros((n, c), dtype=np.int32)
+        self.head_ptr = np.zeros(n, dtype=np.int32)
+        self.length = np.zeros(n, dtype=np.int32)
+        self.direction = np.full(n, RIGHT, dtype=np.int8)
+        self.food = np.zeros(n, dtype=np.int32)
+
+        # Explosives are ring buffers too; the oldest one times out first
+        self.explosives = np.zeros((n, c), dtype=np.int32)
+        self.explosive_start = np.zeros(n, dtype=np.int32)
+        self.explosive_count = np.zeros(n, dtype=np.int32)
+
+        self.timer = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.alive = np.zeros(n, dtype=bool)
+
+        self.reset()
+
+    @property
+    def matrices(self):
+        """Grids of all games with shape (n_games, height, width)"""
+        return self.grid.reshape(self.n_games, self.height, self.width)
+
+    @property
+    def heads(self):
+        """Cell of the head of every snake"""
+        return self.body[np.arange(self.n_games), self.head_ptr]
+
+    def reset(self, games=None, seeds=None):
+        """Starts new games in the given slots (all slots by default)
+        seeds gives the seed of every new game (drawn from the batch's generator by default)"""
+        if games is None:
+            games = np.arange(self.n_games)
+        games = np.asarray(games)
+        if games.dtype == bool:
+            games = np.flatnonzero(games)
+        if len(games) == 0:
+            return
+        if seeds is None:
+            seeds = self.seed_rng.integers(0, 2 ** 63, len(games))
+        self.game_seeds[games] = seeds
+        self.draws[games] = 0
+
+        # Same start as Snake(): one segment in the middle moving right
+        start = (self.height // 2) * self.width + self.width // 2
+        self.grid[games] = EMPTY
+        self.free[games] = np.arange(self.n_cells)
+        self.slot[games] = np.arange(self.n_cells)
+        self.n_free[games] = self.n_cells
+        self.fill(games, np.full(len(games), start), DANGER)
+        self.body[games, 0] = start
+        self.head_ptr[games] = 0
+        self.length[games] = 1
+        self.direction[games] = RIGHT
+
+        # Same start as Food(): any cell off the top row and left column
+        food = np.full(len(games), start)
+        clash = np.ones(len(games), dtype=bool)
+        while np.any(clash):
+            redraw = games[clash]
+            row = 1 + (self.random(redraw) * (self.height - 1)).astype(np.int64)
+            col = 1 + (self.random(redraw) * (self.width - 1)).astype(np.int64)
+            food[clash] = row * self.width + col
+            clash = food == start
+        self.food[games] = food
+        self.fill(games, food, FOOD)
+
+        self.explosive_start[games] = 0
+        self.explosive_count[games] = 0
+        self.timer[games] = 0
+        self.score[games] = 1
+        self.steps[games] = 0
+        self.alive[games] = True
+
+    def fill(self, games, cells, value):
+        """Puts value on empty cells (one cell per game) and removes them from the index"""
+        pos = self.slot[games, cells]
+        last = self.free[games, self.n_free[games] - 1]
+        self.free[games, pos] = last
+        self.slot[games, last] = pos
+        self.n_free[games] -= 1
+        self.grid[games, cells] = value
+
+    def empty(self, games, cells):
+        """Empties cells (one cell per game) and adds them to the index"""
+        self.free[games, self.n_free[games]] = cells
+        self.slot[games, cells] = self.n_free[games]
+        self.n_free[games] += 1
+        self.grid[games, cells] = EMPTY
+
+    def random(self, games):
+        """Next random number in [0, 1) of each of the given games"""
+        self.draws[games] += np.uint64(1)
+        z = self.game_seeds[games] + self.draws[games] * GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * MIX_1
+        z = (z ^ (z >> np.uint64(27))) * MIX_2
+        z ^= z >> np.uint64(31)
+        return (z >> np.uint64(11)) * 2.0 ** -53
+
+    def random_empty_cells(self, games):
+        """Picks a uniformly random empty cell in each of the given games
+        Games without any empty cell get -1"""
+        n_free = self.n_free[games]
+        pos = (self.random(games) * n_free).astype(np.int64)
+        cells = self.free[games, np.minimum(pos, self.n_cells - 1)]
+        cells[n_free == 0] = -1
+        return cells
+
+    def step(self, actions):
+        """Moves every running snake in the direction given in actions
+        Returns which games ate food and which games have ended"""
+        actions = np.asarray(actions)
+        eaten = np.zeros(self.n_games, dtype=bool)
+        games = np.flatnonzero(self.alive)
+        if len(games) == 0:
+            return eaten, ~self.alive
+
+        # Move the heads one cell in their new direction
+        direction = actions[games].astype(np.int8)
+        self.direction[games] = direction
+        head = self.body[games, self.head_ptr[games]]
+        row = head // self.width + ROW_STEP[direction]
+        col = head % self.width + COL_STEP[direction]
+        self.steps[games] += 1
+
+        # End games where the snake hit a wall
+        inside = (row >= 0) & (row < self.height) & (col >= 0) & (col < self.width)
+        self.alive[games[~inside]] = False
+        games, row, col = games[inside], row[inside], col[inside]
+        new_head = (row * self.width + col).astype(np.int32)
+
+        # Remove the last segment of snakes that did not eat
+        ate = new_head == self.food[games]
+        starving = games[~ate]
+        tail_ptr = (self.head_ptr[starving] - self.length[starving] + 1) % self.n_cells
+        self.empty(starving, self.body[starving, tail_ptr])
+        self.length[starving] -= 1
+
+        # End games where the snake bit itself or ran into an explosive
+        crashed = self.grid[games, new_head] == DANGER
+        self.alive[games[crashed]] = False
+        games, new_head, ate = games[~crashed], new_head[~crashed], ate[~crashed]
+
+        # Add the new heads (cells with food are not in the index)
+        self.head_ptr[games] = (self.head_ptr[games] + 1) % self.n_cells
+        self.body[games, self.head_ptr[games]] = new_head
+        self.length[games] += 1
+        self.fill(games[~ate], new_head[~ate], DANGER)
+        self.grid[games[ate], new_head[ate]] = DANGER
+
+        # Spawn new food where food was eaten
+        eaters = games[ate]
+        eaten[eaters] = True
+        self.score[eaters] += 1
+        if len(eaters):
+            food = self.random_empty_cells(eaters)
+            self.food[eaters] = food
+            placed = food >= 0
+            self.fill(eaters[placed], food[placed], FOOD)
+
+        # Logic for spawning and timing out explosives
+        self.timer[games] += 1
+        spawning = games[self.timer[games] % EXPLOSIVE_SPAWN_RATE == 0]
+        if len(spawning):
+            cells = self.random_empty_cells(spawning)
+            placed = cells >= 0
+            spawning, cells = spawning[placed], cells[placed]
+            slot = (self.explosive_start[spawning] + self.explosive_count[spawning]) % self.n_cells
+            self.explosives[spawning, slot] = cells
+            self.explosive_count[spawning] += 1
+            self.fill(spawning, cells, DANGER)
+        expiring = games[(self.timer[games] % EXPLOSIVE_TIMEOUT_RATE == 0) & (self.explosive_count[games] > 0)]
+        if len(expiring):
+            cells = self.explosives[expiring, self.explosive_start[expiring]]
+            self.empty(expiring, cells)
+            self.explosive_start[expiring] = (self.explosive_start[expiring] + 1) % self.n_cells
+            self.explosive_count[expiring] -= 1
+
+        return eaten, ~self.alive
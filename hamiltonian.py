@@ -0,0 +1,186 @@
+# HAMILTONIAN CYCLE PLAYER
+"""
+A Hamiltonian cycle visits every cell of the board once and comes back to its
+start. On a board without explosives, a snake that only follows it can never
+trap itself: its body always covers the cells just behind the head on the
+cycle, and the next cell is either empty or the tail that is about to move
+away.
+
+The cycle is a serpentine over all columns but the first, which leads back
+to the start (a board needs an even number of rows or columns for it). It
+is built once per board size and cached in cycles/ as the position of every
+cell on the cycle, so a move only looks up the positions of the head's
+neighbours.
+
+Shortcuts: the snake may move to a neighbour further ahead on the cycle, as
+long as it doesn't pass its tail (with a buffer for the growth from the next
+food) or the food, and only while at least half of the board is empty.
+
+Explosives break that guarantee. When the next cell of the cycle is blocked,
+the snake searches a path (A*) to the first free cell of the cycle past the
+blocked ones, or else to the food, and follows it to the end before taking
+up the cycle again; with no path to either it moves where it has the most
+room. The off-cycle paths and the explosives that keep piling up can still
+box the snake in, so its games end after a few thousand ticks.
+
+Usage:
+    python3 -m hamiltonian --headless --seed 0
+"""
+import os
+import tempfile
+import numpy as np
+
+from board import DANGER
+from state import GameState
+from pathfinding import get_bfs, get_a_star
+from bitboard import roomiest_move
+from runner import play, parse_args, timing_options
+from records import append_record
+
+SNAKE_SPEED = 30
+TAIL_BUFFER = 4 # Cells kept between the head and the tail when taking a shortcut
+
+current_dir = os.path.dirname(__file__)
+CYCLES_DIR = os.path.abspath(os.path.join(current_dir, 'cycles'))
+
+steps = 0 # Track the number of steps taken by the snake
+
+
+def build_cycle(height, width):
+    """Cells of a Hamiltonian cycle of the board in visiting order"""
+    if height % 2 and width % 2:
+        raise ValueError(f"A {height}x{width} board has no Hamiltonian cycle")
+    if height % 2:
+        # Build the cycle on the transposed board and transpose it back
+        return [(cell % height) * width + cell // height for cell in build_cycle(width, height)]
+
+    cycle = []
+    for row in range(height):
+        cols = range(1, width) if row % 2 == 0 else range(width - 1, 0, -1)
+        cycle.extend(row * width + col for col in cols)
+    cycle.extend(row * width for row in range(height - 1, -1, -1)) # Back up the first column
+    return cycle
+
+
+def load_cycle(height, width):
+    """Position on the cycle of every cell (built and saved the first time)"""
+    path = os.path.join(CYCLES_DIR, f"cycle_{height}x{width}.npy")
+    if os.path.exists(path):
+        return np.load(path)
+    order = np.empty(height * width, dtype=np.int32)
+    order[build_cycle(height, width)] = np.arange(height * width, dtype=np.int32)
+    os.makedirs(CYCLES_DIR, exist_ok=True)
+
+    # Several tournament workers can build the same cycle at once: each writes its own
+    # temporary file and moves it into place, so no one loads a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=CYCLES_DIR, suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, order)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return order
+
+
+class HamiltonianPlanner:
+    """Policy that follows the Hamiltonian cycle, takes safe shortcuts and
+    goes around explosives on the cycle"""
+    __slots__ = ("size", "order", "cycle", "neighbors", "detour", "state", "steps")
+
+    def __init__(self, height, width):
+        self.size = height * width
+        self.order = load_cycle(height, width).tolist()
+        self.cycle = np.argsort(self.order).tolist() # Cell at every position of the cycle
+        self.neighbors = get_bfs(height, width).neighbors
+        self.detour = [] # Cells left of the path around a blocked part of the cycle
+        self.state = None # Game the detour was planned in
+        self.steps = None # Step of that game the next cell of the detour is for
+
+    def __call__(self, state):
+        order, size = self.order, self.size
+        cells = state.board.cells
+        head, tail = state.head, state.body[-1]
+        position = order[head]
+        if state is not self.state or state.steps != self.steps:
+            # New game, or a tick the detour wasn't planned for
+            self.detour = []
+        self.state, self.steps = state, state.steps + 1
+
+        # Keep going around the blocked part of the cycle while the path is free
+        if self.detour:
+            nxt = self.detour.pop(0)
+            if cells[nxt] != DANGER and any(nxt == cell for cell, _ in self.neighbors[head]):
+                return get_bfs(state.height, state.width).direction(head, nxt)
+            self.detour = []
+
+        # Cells ahead on the cycle (the tail counts as a whole lap away for a one-cell snake)
+        to_tail = (order[tail] - position) % size or size
+        to_food = min((order[food] - position) % size for food in state.foods)
+
+        # How far ahead the snake may jump
+        if state.board.n_free < size // 2:
+            skip = 1
+        else:
+            skip = max(1, min(to_tail - TAIL_BUFFER, to_food))
+
+        shortcut, best = None, 0
+        for nxt, direction in self.neighbors[head]:
+            # The tail moves away on this tick, so the snake can follow it
+            if cells[nxt] == DANGER and not (nxt == tail and len(state.body) > 1):
+                continue
+            ahead = (order[nxt] - position) % size
+            if ahead <= skip and ahead > best:
+                shortcut, best = direction, ahead
+        if shortcut is not None:
+            return shortcut
+        return self.go_around(state, position, to_tail)
+
+    def go_around(self, state, position, to_tail):
+        """First move of a path to the first free cell of the cycle past the blocked
+        next cells, or to the food, or the move that leaves the most room"""
+        cells, head = state.board.cells, state.head
+        targets = []
+        for ahead in range(2, to_tail):
+            cell = self.cycle[(position + ahead) % self.size]
+            if cells[cell] != DANGER:
+                targets.append(cell)
+                break
+        targets.append(state.nearest_food())
+
+        a_star = get_a_star(state.height, state.width)
+        for target in targets:
+            if a_star.search(cells, head, target) is not None:
+                self.detour = a_star.path(head, target)
+                return a_star.direction(head, self.detour.pop(0))
+        return roomiest_move(state)
+
+
+def update_record(score):
+    """Log the stats of the most recent game"""
+    append_record("hamiltonian", score, steps)
+
+
+def make_policy(height, width):
+    """Policy of the Hamiltonian cycle player"""
+    return HamiltonianPlanner(height, width)
+
+
+def game_loop(headless=False, seed=None, replay_path=None, speed=SNAKE_SPEED, **display_options):
+    """Main game loop"""
+    global steps
+
+    state = GameState(seed=seed)
+    state = play(
+        make_policy(state.height, state.width), headless=headless, speed=speed, state=state,
+        replay_path=replay_path, **display_options,
+    )
+    steps = state.steps
+    update_record(state.score)
+
+
+# Command to run game
+if __name__ == "__main__":
+    args = parse_args("Snake following a Hamiltonian cycle")
+    game_loop(headless=args.headless, seed=args.seed, replay_path=args.replay, **timing_options(args, SNAKE_SPEED))
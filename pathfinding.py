@@ -0,0 +1,538 @@
+# SHORTEST PATHS ON THE BOARD
+"""
+Breadth-first search over the flat cells of a board (see board.py).
+
+A search doesn't build any path while it runs: every reached cell stores its
+parent, and the first move is found by walking the parents back from the
+goal. The visited, parent and queue arrays are allocated once per board size
+and reused by every search; instead of clearing visited, each search stamps
+it with a new generation number.
+
+Neighbours are tried in the order LEFT, UP, RIGHT, DOWN, the order the BFS
+player has always used, so ties between paths of the same length are broken
+the same way.
+
+CachedPlanner reuses the path of the last search over the next ticks. It
+searches again when the food moved, the snake left the path, an explosive
+spawned on the path or a cell was freed (the old tail or a timed out
+explosive) that is close enough to head and food to give a shorter path.
+It also searches again when a neighbour of the head that a search would try
+before the next cell of the path may be as close to the food, so it makes
+the same moves as a search from scratch every tick.
+
+DistanceField stores the distance of every cell to the closest food, found
+by one search from all the foods at the start of a game. The snake follows
+the field downhill in O(1) per move. When a cell is blocked (new head,
+explosive) or freed (old tail, timed out explosive), or a food is eaten or
+spawns, only the cells whose distance can change are repaired: blocking
+drops the cells that lost every neighbour one step closer to the food and
+refills them from the cells around them, freeing spreads the shorter
+distances out of the freed cell.
+
+AStar searches towards one goal cell with a heap ordered by g + h (steps
+taken + Manhattan distance left). Each cell is expanded at most once, so a
+search costs O(n log n) on a board of n cells. AnytimePlanner gives every
+search a time budget and, when it runs out, moves towards the expanded cell
+closest to the food. A search that ends without reaching the food gives no
+move, like the other planners.
+
+Check that CachedPlanner and DistanceField make the moves of a search from
+scratch on every tick of seeded games:
+    python3 pathfinding.py [--seeds N]
+"""
+import time
+import heapq
+import argparse
+from collections import deque
+
+import numpy as np
+
+from board import FOOD, DANGER
+from state import UP, RIGHT, DOWN, LEFT, DIRECTION_STEPS, OPPOSITE
+
+SEARCH_ORDER = (LEFT, UP, RIGHT, DOWN)
+UNREACHABLE = 1 << 30 # Distance of dangerous cells and cells cut off from the food
+
+
+def as_grid(cells):
+    """Bytes of the cells of a board (any array or nested lists of cell values) in row order
+    Indexing bytes is much faster than indexing numpy arrays"""
+    return np.ascontiguousarray(cells, dtype=np.int8).tobytes()
+
+
+class BFS:
+    __slots__ = ("height", "width", "neighbors", "visited", "parent", "queue", "generation")
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+
+        # (next cell, direction) pairs of every cell, without the moves into the wall
+        self.neighbors = []
+        for row in range(height):
+            for col in range(width):
+                pairs = []
+                for direction in SEARCH_ORDER:
+                    d_row, d_col = DIRECTION_STEPS[direction]
+                    if 0 <= row + d_row < height and 0 <= col + d_col < width:
+                        pairs.append(((row + d_row) * width + col + d_col, direction))
+                self.neighbors.append(tuple(pairs))
+
+        self.visited = [0] * (height * width) # Generation of the last search that reached each cell
+        self.parent = [0] * (height * width)
+        self.queue = [0] * (height * width) # Every cell is queued at most once per search
+        self.generation = 0
+
+    def search(self, cells, start, goal=FOOD):
+        """Finds the closest cell with value goal reachable from start without
+        crossing a dangerous cell (cells is the board, flat or not), or None"""
+        grid = as_grid(cells)
+        neighbors, visited, parent, queue = self.neighbors, self.visited, self.parent, self.queue
+        self.generation += 1
+        generation = self.generation
+
+        visited[start] = generation
+        queue[0] = start
+        head, tail = 0, 1
+        while head < tail:
+            curr = queue[head]
+            head += 1
+            for nxt, _ in neighbors[curr]:
+                if visited[nxt] == generation or grid[nxt] == DANGER:
+                    continue
+                visited[nxt] = generation
+                parent[nxt] = curr
+                if grid[nxt] == goal:
+                    return nxt
+                queue[tail] = nxt
+                tail += 1
+        return None
+
+    def reached(self, cell):
+        """Whether the last search reached cell"""
+        return self.visited[cell] == self.generation
+
+    def first_cell(self, start, cell):
+        """Cell after start on the path the last search found to cell"""
+        parent = self.parent
+        while parent[cell] != start:
+            cell = parent[cell]
+        return cell
+
+    def path(self, start, cell):
+        """Cells of the path the last search found from start to cell (start excluded)"""
+        path = []
+        while cell != start:
+            path.append(cell)
+            cell = self.parent[cell]
+        path.reverse()
+        return path
+
+    def direction(self, start, cell):
+        """Direction code of the move from start to the neighbouring cell"""
+        for nxt, direction in self.neighbors[start]:
+            if nxt == cell:
+                return direction
+        return None
+
+    def first_step(self, cells, start, goal=FOOD):
+        """Direction code of the first move on a shortest path to goal, or None"""
+        cell = self.search(cells, start, goal)
+        if cell is None:
+            return None
+        return self.direction(start, self.first_cell(start, cell))
+
+
+class AStar(BFS):
+    __slots__ = ("cost", "closed", "best", "depth", "expanded", "timed_out")
+
+    def __init__(self, height, width):
+        super().__init__(height, width)
+        self.cost = [0] * (height * width) # Steps from the start (g) of every reached cell
+        self.closed = [0] * (height * width) # Generation of the last search that expanded each cell
+
+    def search(self, cells, start, goal, banned=None, deadline=None):
+        """Finds a shortest path from start to the goal cell without crossing a
+        dangerous cell and returns goal, or None if it can't be reached
+        banned is a direction the first move may not take
+        deadline (a time.perf_counter() value) stops the search early; best is then
+        the expanded cell closest to the goal"""
+        grid = as_grid(cells)
+        width = self.width
+        neighbors, visited, parent, cost, closed = self.neighbors, self.visited, self.parent, self.cost, self.closed
+        self.generation += 1
+        generation = self.generation
+        goal_row, goal_col = divmod(goal, width)
+
+        def distance_left(cell):
+            row, col = divmod(cell, width)
+            return abs(row - goal_row) + abs(col - goal_col)
+
+        visited[start] = generation
+        cost[start] = 0
+        h = distance_left(start)
+        heap = [(h, h, 0, start)] # (g + h, h, order of insertion, cell)
+        pushed = expanded = 0
+        best, best_h, depth = start, h, 0
+        self.timed_out = False
+        while heap:
+            _, h, _, curr = heapq.heappop(heap)
+            if closed[curr] == generation:
+                continue
+            closed[curr] = generation
+            expanded += 1
+            if cost[curr] > depth:
+                depth = cost[curr]
+            if h < best_h:
+                best, best_h = curr, h
+            if curr == goal:
+                break
+
+            # Look at the clock every 32 cells, reading it costs about as much as a cell
+            if deadline is not None and expanded % 32 == 0 and time.perf_counter() > deadline:
+                self.timed_out = True
+                break
+
+            g = cost[curr] + 1
+            for nxt, direction in neighbors[curr]:
+                if curr == start and direction == banned:
+                    continue
+                if closed[nxt] == generation or grid[nxt] == DANGER:
+                    continue
+                if visited[nxt] == generation and cost[nxt] <= g:
+                    continue
+                visited[nxt] = generation
+                cost[nxt] = g
+                parent[nxt] = curr
+                h = distance_left(nxt)
+                pushed += 1
+                heapq.heappush(heap, (g + h, h, pushed, nxt))
+
+        self.best, self.depth, self.expanded = best, depth, expanded
+        return goal if best == goal else None
+
+    def first_step(self, cells, start, goal, banned=None):
+        """Direction code of the first move on a shortest path to the goal cell, or None"""
+        if self.search(cells, start, goal, banned) is None:
+            return None
+        return self.direction(start, self.first_cell(start, goal))
+
+
+_searches = {} # One BFS per board size
+
+
+def get_bfs(height, width):
+    """Shared BFS for boards of this size"""
+    if (height, width) not in _searches:
+        _searches[height, width] = BFS(height, width)
+    return _searches[height, width]
+
+
+class CachedPlanner:
+    """Policy that walks along the last path found by the BFS and only searches
+    again when that path may be blocked or may no longer be the shortest"""
+    __slots__ = ("bfs", "state", "path", "cells", "foods", "head", "tail", "explosives", "searches", "moves")
+
+    def __init__(self):
+        self.bfs = None
+        self.state = None # Game the plan was made for
+        self.path = None
+        self.searches = 0
+        self.moves = 0
+
+    def plan(self, state):
+        """Searches a new path from the head of the snake to the closest food"""
+        self.searches += 1
+        start = state.head
+        goal = self.bfs.search(state.board.cells, start)
+        self.path = deque(self.bfs.path(start, goal)) if goal is not None else None
+        self.cells = set(self.path or ())
+        self.foods = tuple(state.foods)
+
+    def is_stale(self, state):
+        """Whether the board changed in a way that can change the shortest path"""
+        if not self.path or tuple(state.foods) != self.foods or state.head != self.head:
+            return True
+        cells = state.board.cells
+
+        # An explosive spawned on the path
+        explosives = set(state.explosives)
+        if not explosives.isdisjoint(self.cells):
+            return True
+
+        # A freed cell (the old tail or a timed out explosive) is a shortcut if a
+        # path through it could be shorter than the rest of the plan
+        freed = [cell for cell in self.explosives - explosives if cells[cell] != DANGER]
+        if cells[self.tail] != DANGER:
+            freed.append(self.tail)
+        head_row, head_col = divmod(state.head, state.width)
+        foods = [divmod(food, state.width) for food in state.foods]
+        for cell in freed:
+            row, col = divmod(cell, state.width)
+            to_food = min(abs(row - food_row) + abs(col - food_col) for food_row, food_col in foods)
+            if abs(row - head_row) + abs(col - head_col) + to_food < len(self.path):
+                return True
+        return False
+
+    def is_tied(self, state):
+        """Whether a neighbour of the head tried before the next cell of the path may be
+        as close to the food (a new search would then break the tie towards it)"""
+        cells, width = state.board.cells, state.width
+        remaining = len(self.path) - 1 # Distance from the next cell to the food
+        foods = [divmod(food, width) for food in state.foods]
+        for nxt, _ in self.bfs.neighbors[state.head]:
+            if nxt == self.path[0]:
+                return False
+            if cells[nxt] == DANGER:
+                continue
+            row, col = divmod(nxt, width)
+            if min(abs(row - food_row) + abs(col - food_col) for food_row, food_col in foods) <= remaining:
+                return True
+        return False
+
+    def __call__(self, state):
+        if state is not self.state:
+            # New game
+            self.state = state
+            self.bfs = get_bfs(state.height, state.width)
+            self.path = None
+        self.moves += 1
+
+        if self.is_stale(state) or self.is_tied(state):
+            self.plan(state)
+            if not self.path:
+                return None
+
+        cell = self.path.popleft()
+        self.cells.discard(cell)
+        direction = self.bfs.direction(state.head, cell)
+
+        # What the board looks like when the next move is chosen
+        self.head = cell
+        self.tail = state.body[-1]
+        self.explosives = set(state.explosives)
+        return direction
+
+
+_a_stars = {} # One A* per board size
+
+
+def get_a_star(height, width):
+    """Shared A* for boards of this size"""
+    if (height, width) not in _a_stars:
+        _a_stars[height, width] = AStar(height, width)
+    return _a_stars[height, width]
+
+
+class DistanceField:
+    """Policy that follows the distances to the food and repairs them as the board changes"""
+    __slots__ = (
+        "neighbors", "dist", "open", "state", "foods", "head", "tail", "explosives",
+        "searches", "repairs", "moves",
+    )
+
+    def __init__(self):
+        self.state = None # Game the field was computed for
+        self.searches = 0 # Searches from the foods
+        self.repairs = 0 # Cells repaired after blocks and frees
+        self.moves = 0
+
+    @property
+    def matrix(self):
+        """Distances as an int array shaped like the board (UNREACHABLE for cut off cells)"""
+        return np.array(self.dist, dtype=np.int32).reshape(self.state.height, self.state.width)
+
+    def compute(self, state):
+        """Searches the distance of every cell from the closest food"""
+        self.searches += 1
+        grid = state.board.cells.tobytes()
+        neighbors = self.neighbors
+        self.open = bytearray(value != DANGER for value in grid)
+        self.dist = dist = [UNREACHABLE] * len(grid)
+        self.foods = set(state.foods)
+
+        # One search from all the foods at once
+        for food in self.foods:
+            dist[food] = 0
+        queue = deque(self.foods)
+        while queue:
+            curr = queue.popleft()
+            d = dist[curr] + 1
+            for nxt, _ in neighbors[curr]:
+                if dist[nxt] == UNREACHABLE and grid[nxt] != DANGER:
+                    dist[nxt] = d
+                    queue.append(nxt)
+
+    def block(self, cell):
+        """Marks cell as dangerous and repairs the distances that went through it"""
+        neighbors, dist = self.neighbors, self.dist
+        self.open[cell] = 0
+        d = dist[cell]
+        if d == UNREACHABLE:
+            return
+        dist[cell] = UNREACHABLE
+
+        # Drop the cells left without a neighbour one step closer to the food
+        # (the queue holds cells in order of distance, so the closer cells are settled first)
+        dropped = []
+        queue = deque(nxt for nxt, _ in neighbors[cell] if dist[nxt] == d + 1)
+        while queue:
+            curr = queue.popleft()
+            k = dist[curr]
+            if k == UNREACHABLE or any(dist[nxt] == k - 1 for nxt, _ in neighbors[curr]):
+                continue
+            dist[curr] = UNREACHABLE
+            dropped.append(curr)
+            queue.extend(nxt for nxt, _ in neighbors[curr] if dist[nxt] == k + 1)
+        self.repairs += len(dropped)
+
+        # Refill the dropped cells from the cells around them
+        heap = []
+        for curr in dropped:
+            k = min(dist[nxt] for nxt, _ in neighbors[curr]) + 1
+            if k < UNREACHABLE:
+                dist[curr] = k
+                heap.append((k, curr))
+        heapq.heapify(heap)
+        self.spread(heap)
+
+    def unblock(self, cell):
+        """Marks cell as free and spreads the shorter distances it opens"""
+        self.open[cell] = 1
+        k = min(self.dist[nxt] for nxt, _ in self.neighbors[cell]) + 1
+        if k < UNREACHABLE:
+            self.dist[cell] = k
+            self.spread([(k, cell)])
+
+    def spread(self, heap):
+        """Lowers the distances around the (distance, cell) pairs of heap"""
+        neighbors, dist, open_cells = self.neighbors, self.dist, self.open
+        while heap:
+            k, curr = heapq.heappop(heap)
+            if k > dist[curr]:
+                continue
+            k += 1
+            for nxt, _ in neighbors[curr]:
+                if open_cells[nxt] and dist[nxt] > k:
+                    dist[nxt] = k
+                    self.repairs += 1
+                    heapq.heappush(heap, (k, nxt))
+
+    def add_food(self, cell):
+        """Makes cell a source of the field"""
+        self.dist[cell] = 0
+        self.spread([(0, cell)])
+
+    def update(self, state):
+        """Brings the field up to date with the board after the last move
+        (an eaten food is blocked by the head, a new one becomes a source)"""
+        foods = set(state.foods)
+        if len(foods) <= 2 and foods != self.foods:
+            # Most distances depend on the eaten food, a new search is cheaper than a repair
+            self.compute(state)
+            return
+        explosives = set(state.explosives)
+        cells = state.board.cells
+        for cell in self.explosives - explosives:
+            if cells[cell] != DANGER:
+                self.unblock(cell)
+        if cells[self.tail] != DANGER:
+            self.unblock(self.tail)
+        self.block(state.head)
+        for cell in foods - self.foods:
+            self.add_food(cell)
+        for cell in explosives - self.explosives:
+            self.block(cell)
+        self.foods = foods
+
+    def __call__(self, state):
+        if state is not self.state:
+            # New game
+            self.state = state
+            self.neighbors = get_bfs(state.height, state.width).neighbors
+            self.compute(state)
+        elif state.head == self.head:
+            self.update(state)
+        else:
+            self.compute(state) # The snake didn't make the move it was given
+        self.moves += 1
+
+        # Go downhill
+        best, move, self.head = UNREACHABLE, None, state.head
+        for nxt, direction in self.neighbors[state.head]:
+            if self.dist[nxt] < best:
+                best, move, self.head = self.dist[nxt], direction, nxt
+
+        # What the board looks like when the next move is chosen
+        self.tail = state.body[-1]
+        self.explosives = set(state.explosives)
+        return move
+
+
+class AnytimePlanner:
+    """Policy that searches the food with A* for at most budget microseconds per move
+    and keeps the time used and the depth reached by every search"""
+    __slots__ = ("budget", "banned_reverse", "used", "depths", "timeouts")
+
+    def __init__(self, budget=None, banned_reverse=True):
+        self.budget = budget # Microseconds per move (None waits for the whole search)
+        self.banned_reverse = banned_reverse
+        self.used = [] # Microseconds used by every move
+        self.depths = [] # Deepest path looked at by every move
+        self.timeouts = 0
+
+    def __call__(self, state):
+        start = time.perf_counter()
+        deadline = start + self.budget / 1e6 if self.budget else None
+        a_star = get_a_star(state.height, state.width)
+        banned = OPPOSITE[state.direction] if self.banned_reverse else None
+        found = a_star.search(state.board.cells, state.head, state.nearest_food(), banned=banned, deadline=deadline)
+
+        # Best move so far: towards the food, or towards the cell closest to it when the time ran out
+        # (a search that ended without reaching the food returns None, the food can't be reached)
+        move = None
+        if (found is not None or a_star.timed_out) and a_star.best != state.head:
+            move = a_star.direction(state.head, a_star.first_cell(state.head, a_star.best))
+        self.timeouts += a_star.timed_out
+        self.depths.append(a_star.depth)
+        self.used.append((time.perf_counter() - start) * 1e6)
+        return move
+
+    def report(self):
+        """Summary of the time used and depth reached per move"""
+        if not self.used:
+            return "no moves"
+        used = sorted(self.used)
+        budget = f"{self.budget} us" if self.budget else "none"
+        return (
+            f"budget {budget}, used mean {sum(used) / len(used):.0f} us, "
+            f"p99 {used[int(len(used) * 0.99)]:.0f} us, max {used[-1]:.0f} us, "
+            f"depth mean {sum(self.depths) / len(self.depths):.1f}, "
+            f"{self.timeouts} of {len(used)} moves out of time"
+        )
+
+
+def check_planners(seeds=5):
+    """Plays seeded games with a search from scratch every tick and checks that
+    CachedPlanner and DistanceField give the same move on every tick"""
+    from state import GameState
+
+    for seed in range(seeds):
+        state = GameState(seed=seed)
+        bfs = get_bfs(state.height, state.width)
+        planners = {"cached": CachedPlanner(), "field": DistanceField()}
+        while state.alive:
+            move = bfs.first_step(state.board.cells, state.head)
+            for name, planner in planners.items():
+                assert planner(state) == move, f"seed {seed}, tick {state.steps}: {name} and a new search differ"
+            if move is None:
+                break
+            state.step(move)
+        searches = ", ".join(f"{name} {planner.searches} searches" for name, planner in planners.items())
+        print(f"seed {seed}: same moves on {state.steps} ticks (score {state.score}; {searches})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the incremental planners against a search from scratch")
+    parser.add_argument("--seeds", type=int, default=5, help="number of seeded games to play")
+    check_planners(parser.parse_args().seeds)
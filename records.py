@@ -0,0 +1,44 @@
+# RECORD STORE (logger.csv)
+"""
+Every finished game adds one row to logger.csv:
+player,score,number of steps,steps per score,time
+
+Rows are appended while holding an exclusive lock on the file, so games that
+finish at the same time in different processes can't interleave their rows.
+"""
+import os
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: # Windows has no fcntl; appends are not locked there
+    fcntl = None
+
+current_dir = os.path.dirname(__file__)
+LOGGER_FILE_PATH = os.path.abspath(os.path.join(current_dir, 'logger.csv'))
+
+
+def format_record(player, score, steps, time=None):
+    """Row of logger.csv for one game"""
+    if time is None:
+        time = datetime.now()
+    current_time = time.strftime('%d-%m-%Y %H:%M:%S')
+    return f"\n{player},{score},{steps},{steps//score},{current_time}"
+
+
+def append_records(records, logger_file_path=LOGGER_FILE_PATH):
+    """Appends (player, score, steps) rows to the record store in one locked write"""
+    rows = "".join(format_record(player, score, steps) for player, score, steps in records)
+    with open(logger_file_path, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(rows)
+        f.flush()
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return None
+
+
+def append_record(player, score, steps):
+    """Log the stats of one game"""
+    append_records([(player, score, steps)])
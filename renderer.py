@@ -0,0 +1,140 @@
+# DRAWING OF A GAME IN A PYGAME WINDOW
+"""
+Only the windowed runs import this module, so headless runs never load pygame.
+This is also the only place where cells are scaled up to pixels.
+
+The first frame of a game is drawn in full. After that only the cells the
+board reports as changed (new head, freed tail, food and explosives) are
+blitted from pre-filled sprites and only their rectangles are sent to the
+display, so a frame costs the same for a snake of 1 or 1000 segments.
+The score is built from pre-rendered glyphs and redrawn only when it changes
+or a cell under it does.
+"""
+import sys
+import pygame
+
+from board import EMPTY, FOOD
+
+# Constants
+CELL_SIZE = 10
+SNAKE_COLOR = (255, 255, 255)
+FOOD_COLOR = (255, 255, 255)
+EXPLOSIVE_COLOR = (255, 0, 0)
+BG_COLOR = (0, 0, 0)
+TEXT_COLOR = (255, 255, 255)
+SCORE_POSITION = (10, 10)
+
+
+class Renderer:
+    def __init__(self, height, width, food_color=FOOD_COLOR, show_score=True):
+        self.height = height
+        self.width = width
+        self.show_score = show_score
+
+        # Initialize Pygame
+        pygame.init()
+        self.win = pygame.display.set_mode((width*CELL_SIZE, height*CELL_SIZE))
+        self.font = pygame.font.SysFont(None, 35)
+
+        # One pre-filled sprite per kind of cell
+        self.sprites = {}
+        for name, color in (("empty", BG_COLOR), ("snake", SNAKE_COLOR), ("food", food_color), ("explosive", EXPLOSIVE_COLOR)):
+            sprite = pygame.Surface((CELL_SIZE, CELL_SIZE))
+            sprite.fill(color)
+            self.sprites[name] = sprite.convert()
+
+        # Pre-rendered score text: the label and one glyph per digit
+        self.score_label = self.font.render("Score: ", True, TEXT_COLOR)
+        self.digits = [self.font.render(str(digit), True, TEXT_COLOR) for digit in range(10)]
+
+        self.board = None # Board of the game on screen
+        self.score = None # Score on screen
+        self.score_rect = pygame.Rect(SCORE_POSITION, (0, 0))
+
+    def rect(self, cell):
+        """Screen rectangle of a cell"""
+        row, col = divmod(cell, self.width)
+        return pygame.Rect(col*CELL_SIZE, row*CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+    def handle_events(self):
+        """Closes the game when the window is closed"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+
+    def draw_cell(self, state, cell, explosives):
+        """Blits the sprite of a cell and returns its rectangle (explosives is the set of explosive cells)"""
+        value = state.board.cells[cell]
+        if value == EMPTY:
+            sprite = self.sprites["empty"]
+        elif value == FOOD:
+            sprite = self.sprites["food"]
+        elif cell in explosives:
+            sprite = self.sprites["explosive"]
+        else:
+            sprite = self.sprites["snake"]
+        rect = self.rect(cell)
+        self.win.blit(sprite, rect)
+        return rect
+
+    def draw_score(self, state, explosives):
+        """Draws the score from the cached glyphs and returns the area that changed"""
+        # Restore the cells under the old score
+        old_rect = self.score_rect
+        first_row, last_row = old_rect.top // CELL_SIZE, min(old_rect.bottom // CELL_SIZE, self.height - 1)
+        first_col, last_col = old_rect.left // CELL_SIZE, min(old_rect.right // CELL_SIZE, self.width - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                self.draw_cell(state, row * self.width + col, explosives)
+
+        x, y = SCORE_POSITION
+        self.win.blit(self.score_label, (x, y))
+        x += self.score_label.get_width()
+        for digit in str(state.score):
+            glyph = self.digits[int(digit)]
+            self.win.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+        self.score = state.score
+        self.score_rect = pygame.Rect(SCORE_POSITION, (x - SCORE_POSITION[0], self.score_label.get_height()))
+        return old_rect.union(self.score_rect)
+
+    def draw(self, state):
+        """Draws the cells that changed since the last frame and the score"""
+        board = state.board
+        # Explosives pile up over a long game (one spawns every 20 ticks, one times out every 200),
+        # so the cells are looked up in a set built once per frame
+        explosives = set(state.explosives)
+        if board is not self.board:
+            # New game: draw every cell once and start tracking changes
+            self.board = board
+            board.dirty = []
+            self.win.fill(BG_COLOR)
+            for cell in range(self.height * self.width):
+                if board.cells[cell] != EMPTY:
+                    self.draw_cell(state, cell, explosives)
+            if self.show_score:
+                self.draw_score(state, explosives)
+            pygame.display.update()
+            return
+
+        rects = [self.draw_cell(state, cell, explosives) for cell in dict.fromkeys(board.take_dirty())]
+
+        # Display score (the cells drawn above may have covered part of it)
+        if self.show_score and (state.score != self.score or self.score_rect.collidelist(rects) != -1):
+            rects.append(self.draw_score(state, explosives))
+
+        pygame.display.update(rects)
+
+    def game_over(self, score):
+        """Displays final score for 5 seconds and closes the window"""
+        if self.show_score:
+            font = pygame.font.SysFont(None, 60)
+            game_over_text_1 = font.render(f"Game Over", True, TEXT_COLOR)
+            game_over_text_2 = font.render(f"Final score: {score}", True, TEXT_COLOR)
+            self.win.blit(game_over_text_1, (270, 220))
+            self.win.blit(game_over_text_2, (250, 270))
+        pygame.display.update()
+        pygame.time.delay(5000)
+        pygame.quit()
@@ -0,0 +1,115 @@
+# REPLAYS OF GAMES
+"""
+A game is decided by its seed and its moves, so a replay only stores those.
+
+Binary format (little endian):
+    b"SNKR"                                 magic
+    version, height, width, flags           4 bytes (flags: 1 - grows, 2 - has explosives)
+    number of foods                         1 byte (since version 2)
+    seed                                    8 bytes
+    number of moves                         4 bytes
+    moves                                   2 bits per direction code, 4 moves per byte
+
+Version 1 replays (one food, no food count) can still be read.
+
+A 7858-step game takes about 2 KB and re-simulates headlessly in milliseconds.
+
+Usage:
+    python3 -m replay game.snkr [--steps N]
+"""
+import time
+import struct
+import argparse
+import numpy as np
+
+from state import GameState
+
+MAGIC = b"SNKR"
+VERSION = 2
+HEADER = struct.Struct("<4sBBBBBQI")
+HEADER_V1 = struct.Struct("<4sBBBBQI")
+GROWS, HAS_EXPLOSIVES = 1, 2
+MAX_SEED = 2 ** 64 - 1 # Seeds are stored unsigned in 8 bytes
+
+
+class ReplayWriter:
+    def __init__(self, state):
+        """Starts the replay of a game that has not made any move yet"""
+        if not 0 <= state.seed <= MAX_SEED:
+            raise ValueError(f"A replay can only store seeds from 0 to {MAX_SEED}, not {state.seed}")
+        self.height = state.height
+        self.width = state.width
+        self.flags = (GROWS if state.grows else 0) | (HAS_EXPLOSIVES if state.has_explosives else 0)
+        self.n_food = len(state.foods)
+        self.seed = state.seed
+        self.moves = bytearray()
+        self.n_moves = 0
+
+    def record(self, direction):
+        """Adds one move"""
+        if self.n_moves % 4 == 0:
+            self.moves.append(0)
+        self.moves[-1] |= direction << (2 * (self.n_moves % 4))
+        self.n_moves += 1
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, VERSION, self.height, self.width, self.flags, self.n_food, self.seed, self.n_moves)
+        return header + bytes(self.moves)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+
+class Replay:
+    __slots__ = ("height", "width", "flags", "n_food", "seed", "moves")
+
+    def __init__(self, data):
+        magic, version = data[:4], data[4]
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("Not a snake replay (or written by another version)")
+        if version == 1:
+            _, _, self.height, self.width, self.flags, self.seed, n_moves = HEADER_V1.unpack_from(data)
+            self.n_food, offset = 1, HEADER_V1.size
+        else:
+            _, _, self.height, self.width, self.flags, self.n_food, self.seed, n_moves = HEADER.unpack_from(data)
+            offset = HEADER.size
+
+        # Unpack the 2-bit direction codes into one int per move
+        packed = np.frombuffer(data, dtype=np.uint8, offset=offset)
+        self.moves = ((packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3).ravel()[:n_moves].tolist()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def new_game(self):
+        """Fresh game with the seed and settings of the replay"""
+        return GameState(
+            self.height, self.width, seed=self.seed,
+            grows=bool(self.flags & GROWS), has_explosives=bool(self.flags & HAS_EXPLOSIVES), n_food=self.n_food,
+        )
+
+    def play(self, steps=None):
+        """Re-simulates the first steps moves (all by default) and returns the state"""
+        state = self.new_game()
+        for direction in self.moves[:steps]:
+            if not state.alive:
+                break
+            state.step(direction)
+        return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-simulate a replay without a window")
+    parser.add_argument("path")
+    parser.add_argument("--steps", type=int, default=None, help="stop after this many moves")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    state = replay.play(args.steps)
+    elapsed = time.perf_counter() - start
+    print(f"seed {replay.seed}: score {state.score}, steps {state.steps}, alive {state.alive} "
+          f"({len(replay.moves)} moves in replay, re-simulated in {elapsed*1000:.1f} ms)")
@@ -0,0 +1,234 @@
+# SHARED GAME LOOP OF THE AI PLAYERS
+"""
+A player is a policy: a function that takes the GameState and returns the
+direction code of the next move, or None when it cannot find a move.
+
+Headless games never import pygame, run as fast as the policy allows and
+skip the game over screen. Windowed games show the final score for 5 seconds.
+
+In a windowed game the simulation and the drawing run at their own rates:
+speed is the number of ticks per second (None for turbo, i.e. as fast as the
+policy allows) and the window is drawn every render_every ticks, or at most
+fps times per second when fps is given. Cells changed by skipped ticks are
+kept by the board and drawn with the next frame.
+
+With background=True a windowed game runs the policy in a worker thread
+(see BackgroundPlanner): the next moves are searched while the window is
+drawn and the loop sleeps, and a move that isn't ready when its tick comes
+is replaced by a safe one.
+"""
+import time
+import argparse
+import threading
+
+from board import DANGER
+from state import GameState
+from replay import ReplayWriter, MAX_SEED
+
+LOOKAHEAD = 2 # Moves the background planner searches ahead of the game
+
+
+def safe_direction(state):
+    """Keeps going in the current direction if that is safe, else takes the first safe turn"""
+    directions = [state.direction] + [direction for direction in range(4) if direction != state.direction]
+    for direction in directions:
+        cell = state.next_cell(state.head, direction)
+        if cell is not None and state.board.cells[cell] != DANGER:
+            return direction
+    return state.direction
+
+
+class BackgroundPlanner:
+    """Runs a policy in a worker thread a few moves ahead of the game
+
+    After each move the game submits its state. The worker plays on a clone
+    of it: it searches the move of that state, applies it (the clone keeps
+    the random generator, so it spawns the same food and explosives as the
+    game) and searches the move after that. The policy is only ever called
+    from the worker thread, on clones, so it must not rely on seeing the
+    same state object every move."""
+
+    def __init__(self, policy, lookahead=LOOKAHEAD):
+        self.policy = policy
+        self.lookahead = lookahead
+        self.condition = threading.Condition()
+        self.job = None # State waiting for the worker
+        self.generation = 0 # Number of submitted states
+        self.moves = {} # (steps, key of state) -> move found by the worker
+        self.ready = self.waited = self.fallbacks = 0
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, state):
+        """Asks the worker to plan from state (drops the moves of older states)"""
+        with self.condition:
+            self.moves = {key: move for key, move in self.moves.items() if key[0] >= state.steps}
+            self.job = state.clone()
+            self.generation += 1
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.job is None:
+                    self.condition.wait()
+                state, generation, self.job = self.job, self.generation, None
+
+            for _ in range(self.lookahead):
+                key = (state.steps, state.key())
+                move = self.moves.get(key)
+                if key not in self.moves:
+                    move = self.policy(state)
+                    with self.condition:
+                        self.moves[key] = move
+                        self.condition.notify_all()
+                if move is None or generation != self.generation:
+                    break
+                state.step(move)
+                if not state.alive:
+                    break
+
+    def move(self, state, deadline):
+        """Move of state, or a safe move if the worker hasn't found it by deadline"""
+        key = (state.steps, state.key())
+        with self.condition:
+            if key in self.moves:
+                self.ready += 1
+                return self.moves[key]
+            while key not in self.moves:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.fallbacks += 1
+                    return safe_direction(state)
+                self.condition.wait(remaining)
+            self.waited += 1
+            return self.moves[key]
+
+    def report(self):
+        return f"Background planner: {self.ready} moves ready, {self.waited} waited for, {self.fallbacks} safe fallbacks"
+
+
+def wait_for_tick(next_tick, tick_time):
+    """Sleeps until next_tick and returns the tick to count the next one from
+    (the current time after a slow move, so the game doesn't burst to catch up)"""
+    delay = next_tick - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    elif delay < -tick_time:
+        return time.perf_counter()
+    return next_tick
+
+
+def play(
+    policy, headless=False, speed=30, seed=None, state=None, max_steps=None, replay_path=None,
+    fps=None, render_every=1, background=False, **window_options,
+):
+    """Plays one game with policy and returns its final state
+    max_steps stops games that would never end (e.g. a small snake going back and forth)
+    replay_path saves the seed and moves of the game (see replay.py)"""
+    if state is None:
+        state = GameState(seed=seed)
+    recorder = ReplayWriter(state) if replay_path else None
+
+    renderer = None
+    if not headless:
+        from renderer import Renderer
+        renderer = Renderer(state.height, state.width, **window_options)
+        renderer.draw(state)
+    tick_time = 1 / speed if speed else 0
+    frame_time = 1 / fps if fps else 0
+    next_tick = next_frame = time.perf_counter()
+
+    # Moves are only searched in the background when there are ticks to wait for
+    planner = None
+    if background and renderer and tick_time:
+        planner = BackgroundPlanner(policy)
+        planner.submit(state)
+        next_tick += tick_time
+
+    while state.alive and (max_steps is None or state.steps < max_steps):
+        if planner:
+            direction = planner.move(state, next_tick)
+            next_tick = wait_for_tick(next_tick, tick_time)
+        else:
+            direction = policy(state)
+
+        # End game because no valid move was found
+        if direction is None:
+            break
+
+        # Move the snake
+        state.step(direction)
+        if recorder:
+            recorder.record(direction)
+        if planner:
+            planner.submit(state)
+
+        if not renderer:
+            continue
+
+        # Draw the window (events are handled with each frame)
+        if fps:
+            now = time.perf_counter()
+            if now >= next_frame:
+                next_frame = max(next_frame + frame_time, now)
+                renderer.handle_events()
+                renderer.draw(state)
+        elif state.steps % render_every == 0:
+            renderer.handle_events()
+            renderer.draw(state)
+
+        # Wait for the next tick (the background planner waits for it with the next move)
+        if tick_time:
+            next_tick += tick_time
+            if not planner:
+                next_tick = wait_for_tick(next_tick, tick_time)
+
+    if planner:
+        print(planner.report())
+    if recorder:
+        recorder.save(replay_path)
+    if renderer:
+        renderer.draw(state)
+        renderer.game_over(state.score)
+    return state
+
+
+def seed_arg(text):
+    """Seed from the command line (replays store seeds unsigned in 8 bytes)"""
+    seed = int(text)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"seeds go from 0 to {MAX_SEED}")
+    return seed
+
+
+def parse_args(description, models=None, planners=None, budget=False, runtimes=None, cache=False):
+    """Command line options shared by the AI players"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--headless", action="store_true", help="run without a window and without a speed cap")
+    parser.add_argument("--seed", type=seed_arg, default=None, help="seed of the random spawns")
+    parser.add_argument("--replay", default=None, metavar="PATH", help="save a replay of the game to PATH")
+    parser.add_argument("--speed", type=float, default=None, help="ticks per second (default: the player's speed)")
+    parser.add_argument("--turbo", action="store_true", help="run the simulation as fast as possible")
+    parser.add_argument("--fps", type=float, default=None, help="draw the window at most this many times per second")
+    parser.add_argument("--render-every", type=int, default=1, metavar="N", help="draw the window every N ticks")
+    parser.add_argument("--background", action="store_true", help="search the next moves in a worker thread")
+    if models:
+        parser.add_argument("--model", choices=models, default=models[-1], help="weights the player uses")
+    if planners:
+        parser.add_argument("--planner", choices=planners, default=planners[0], help="how the player searches its moves")
+    if runtimes:
+        parser.add_argument("--runtime", choices=runtimes, default=runtimes[0], help="how the model runs its forward pass")
+    if cache:
+        parser.add_argument("--cache", type=int, default=None, metavar="N", help="remember the moves of the last N matrices")
+    if budget:
+        parser.add_argument("--budget", type=int, default=None, metavar="US", help="time limit of a move in microseconds")
+    return parser.parse_args()
+
+
+def timing_options(args, speed):
+    """Simulation and drawing rates from the command line (speed is the player's default)"""
+    if args.turbo:
+        speed = None
+    elif args.speed:
+        speed = args.speed
+    return {"speed": speed, "fps": args.fps, "render_every": args.render_every, "background": args.background}
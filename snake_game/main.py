@@ -1,5 +1,12 @@
+import random
+import argparse
 import pygame
-import numpy as np
+
+# Include top level modules
+import os, sys
+current_dir = os.path.dirname(__file__)
+sys.path.append(os.path.abspath(os.path.join(current_dir, '..')))
+
 from characters import (
     # Characters
     Snake, 
@@ -8,26 +15,13 @@ from characters import (
     
     # Display variables
     win_height,
-    win_width
+    win_width,
+    to_cell,
 )
+from board import Board
 
-def update_matrix(curr_matrix, snakes, food, explosives):
-    """Update the position of characters in matrix"""
-    
-    # Update snakes's body and explostions in matrix
-    # Switch x and y because of numpy
-    for pos in (snakes + explosives):
-        x, y = pos[0]//10, pos[1]//10
-        curr_matrix[y][x] = 2
-    
-    # Update food in matrix
-    x, y = food[0]//10, food[1]//10
-    curr_matrix[y][x] = 1  
-    
-    return curr_matrix
-   
-def game_loop():
-    """Main game loop"""
+def game_loop(seed=None):
+    """Main game loop (seed decides the spawns of food and explosives)"""
 
     # Constants
     SNAKE_SPEED = 12
@@ -48,23 +42,14 @@ def game_loop():
 
     score = 1
     snake = Snake()
-    food = Food()
+    rng = random.Random(seed)
+    food = Food(rng=rng)
     explosive = Explosive()
+    board = Board.from_characters(snake, food, explosive, seed=rng.getrandbits(64)) # The board draws the later spawns
+    matrix = board.matrix # Changes to the board show up in the matrix
 
     running = True
     while running:
-        # Create new matrix
-        """
-        Values in matrix
-        0 - empty cell
-        1 - food
-        2 - dangerous cells (snake's body and explosives)
-        """
-        matrix = np.zeros((win_height//10, win_width//10))
-        
-        # Update cells of matrix
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
-        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -82,21 +67,25 @@ def game_loop():
         snake.grow()
             
         # Logic for eating food and spawning new one
-        if snake.body[0] == food.position:
+        ate = snake.body[0] == food.position
+        if ate:
             score += 1
-            food.spawn_new_food(matrix=matrix)
+            food.spawn_new_food(board=board)
         # If no food eaten, remove last segment of snake
         else: 
+            tail = snake.body[-1]
             snake.shrink()
             
         # Check if snake bit itself or has hit wall and end game if it has
-        if (snake.body[0] in snake.body[1:] or
+        if (snake.bit_itself() or
             snake.body[0][0] not in range(0, win_width) or
             snake.body[0][1] not in range(0, win_height)):
             break
             
-        # Update cells of matrix (effect change in food's position)
-        matrix = update_matrix(matrix, snake.body, food.position, explosive.explosives)
+        # Update cells of matrix (effect change in snake's and food's position)
+        board.move_snake(to_cell(snake.body[0]), None if ate else to_cell(tail))
+        if ate:
+            board.place_food(to_cell(food.position))
             
         # Logic for running into bombs  
         if snake.body:
@@ -105,6 +94,7 @@ def game_loop():
                     if explo == snake.body[0]:
                         score -= 1
                         explosive.destroy_explosive(i)
+                        board.release(to_cell(snake.body[-1]))
                         snake.shrink()
             
         # Check if snake is dead and end game if so
@@ -114,8 +104,10 @@ def game_loop():
         # Logic for spawning and timing out explosives
         explosive_TIMER += 1
         if explosive_TIMER % 20 == 0: 
-            explosive.spawn_explosive(matrix=matrix)
+            explosive.spawn_explosive(board=board)
+            board.occupy(to_cell(explosive.explosives[-1]))
         if explosive_TIMER % 200 == 0:
+            board.release(to_cell(explosive.explosives[0]))
             explosive.destroy_explosive(0)
             
         # Drawing snake, good food and explosives
@@ -149,4 +141,6 @@ def game_loop():
 
 # Command to run game
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Snake played with the arrow keys")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random spawns")
+    game_loop(seed=parser.parse_args().seed)
\ No newline at end of file
@@ -0,0 +1,179 @@
+# COMPACT STATE OF ONE GAME
+"""
+Grid-unit version of the game played by Snake, Food and Explosive.
+
+Positions are cell indices (row * width + col) instead of pixels and
+directions are small ints instead of strings. Pixels only come back into
+play when a game is drawn (see renderer.py).
+
+Rules (same as the game loops of the AI players):
+1. The snake moves one cell per tick and loses its last segment unless it ate.
+2. Eaten food respawns on a random empty cell. A game can have several foods
+on the board at once (n_food); food is the first of them.
+3. An explosive spawns on a random empty cell every 20 ticks and the oldest
+one times out every 200 ticks.
+4. The game ends when the snake hits a wall, itself or an explosive.
+"""
+import os
+from collections import deque
+
+from characters import win_height, win_width
+from board import Board, FOOD, DANGER
+
+# Direction codes (same order as the labels of the CNN players)
+UP, RIGHT, DOWN, LEFT = 0, 1, 2, 3
+DIRECTION_NAMES = ("UP", "RIGHT", "DOWN", "LEFT")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTION_NAMES)}
+DIRECTION_STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1)) # (row, col) step of each direction
+OPPOSITE = (DOWN, LEFT, UP, RIGHT)
+
+EXPLOSIVE_SPAWN_RATE = 20 # Ticks between two explosive spawns
+EXPLOSIVE_TIMEOUT_RATE = 200 # Ticks between two explosive timeouts
+
+
+class GameState:
+    __slots__ = (
+        "height", "width", "board", "body", "direction",
+        "foods", "explosives", "timer", "score", "steps", "alive",
+        "grows", "has_explosives", "seed",
+    )
+
+    def __init__(self, height=win_height//10, width=win_width//10, seed=None, grows=True, has_explosives=True, n_food=1):
+        self.height = height
+        self.width = width
+        self.grows = grows # The small snake keeps one segment even when it eats
+        self.has_explosives = has_explosives
+
+        # Every game owns its random generator; the seed is kept so the game can be replayed
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.seed = seed
+        self.board = Board(height, width, seed=seed)
+
+        # Same start as Snake(): one segment in the middle moving right
+        start = (height // 2) * width + width // 2
+        self.body = deque([start])
+        self.board.occupy(start)
+        self.direction = RIGHT
+
+        # Same start as Food(): any cell off the top row and left column
+        food = start
+        while food == start:
+            food = self.board.rng.randrange(1, height) * width + self.board.rng.randrange(1, width)
+        self.foods = [food]
+        self.board.place_food(food)
+
+        # The other foods go on random empty cells
+        while len(self.foods) < n_food and self.board.n_free:
+            food = self.board.random_empty_cell()
+            self.foods.append(food)
+            self.board.place_food(food)
+
+        self.explosives = deque()
+        self.timer = 0
+        self.score = 1
+        self.steps = 0
+        self.alive = True
+
+    @property
+    def head(self):
+        return self.body[0]
+
+    @property
+    def food(self):
+        """First food (the only one unless the game has several)"""
+        return self.foods[0]
+
+    def nearest_food(self):
+        """Food closest to the head (Manhattan distance), for players that chase one food"""
+        if len(self.foods) == 1:
+            return self.foods[0]
+        row, col = divmod(self.head, self.width)
+        return min(self.foods, key=lambda food: abs(food // self.width - row) + abs(food % self.width - col))
+
+    @property
+    def matrix(self):
+        """Values in matrix: 0 - empty, 1 - food, 2 - snake's body and explosives"""
+        return self.board.matrix
+
+    def next_cell(self, cell, direction):
+        """Cell next to cell in direction, or None if that is outside the board"""
+        row, col = divmod(cell, self.width)
+        d_row, d_col = DIRECTION_STEPS[direction]
+        row, col = row + d_row, col + d_col
+        if row < 0 or row >= self.height or col < 0 or col >= self.width:
+            return None
+        return row * self.width + col
+
+    def step(self, direction):
+        """Moves the snake one cell in direction
+        Returns True if the snake ate the food on this move"""
+        board = self.board
+        self.direction = direction
+        self.steps += 1
+
+        # End game if snake hit the wall
+        head = self.next_cell(self.body[0], direction)
+        if head is None:
+            self.alive = False
+            return False
+
+        # If no food eaten, remove last segment of snake
+        ate = board.cells[head] == FOOD
+        if not ate or not self.grows:
+            board.release(self.body.pop())
+
+        # End game if snake bit itself or ran into an explosive
+        if board.cells[head] == DANGER:
+            self.alive = False
+            return False
+        self.body.appendleft(head)
+        board.occupy(head)
+
+        # Logic for eating food and spawning new one
+        if ate:
+            self.score += 1
+            if board.n_free:
+                food = board.random_empty_cell()
+                self.foods[self.foods.index(head)] = food
+                board.place_food(food)
+
+        # Logic for spawning and timing out explosives
+        self.timer += 1
+        if not self.has_explosives:
+            return ate
+        if self.timer % EXPLOSIVE_SPAWN_RATE == 0 and board.n_free:
+            explosive = board.random_empty_cell()
+            self.explosives.append(explosive)
+            board.occupy(explosive)
+        if self.timer % EXPLOSIVE_TIMEOUT_RATE == 0 and self.explosives:
+            board.release(self.explosives.popleft())
+
+        return ate
+
+    def clone(self):
+        """Makes an independent copy of the game, e.g. for search"""
+        state = GameState.__new__(GameState)
+        state.height, state.width = self.height, self.width
+        state.grows, state.has_explosives = self.grows, self.has_explosives
+        state.seed = self.seed
+        state.board = self.board.copy()
+        state.body = self.body.copy()
+        state.explosives = self.explosives.copy()
+        state.direction = self.direction
+        state.foods = self.foods.copy()
+        state.timer = self.timer
+        state.score = self.score
+        state.steps = self.steps
+        state.alive = self.alive
+        return state
+
+    def key(self):
+        """Everything that decides how the game goes on, as a hashable tuple"""
+        return (tuple(self.body), tuple(self.foods), tuple(self.explosives), self.timer % EXPLOSIVE_TIMEOUT_RATE)
+
+    def __eq__(self, other):
+        return isinstance(other, GameState) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
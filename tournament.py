@@ -0,0 +1,139 @@
+# TOURNAMENT OF THE AI PLAYERS
+"""
+Plays K seeded headless games for each player across a process pool and
+prints the distribution of score, steps and steps per score of each player.
+
+Every player plays the same seeds (seed, seed + 1, ...), so the players face
+the same food and explosive spawns as long as they make the same moves.
+Worker processes only send their results back; the parent appends all rows
+to logger.csv in one locked write (see records.py).
+
+With --server the CNN models are loaded once, in an inference server
+process that predicts the moves of all workers in batches (see
+cnn_players/server.py), instead of once per worker.
+
+Usage:
+    python3 -m tournament --players bfs cnn_5by5 --games 1000 --seed 0
+"""
+import os
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from state import GameState
+from runner import play, seed_arg
+from records import append_records
+from replay import MAX_SEED
+from cnn_players.server import InferenceServer, connect, remote_model
+
+PLAYERS = ("bfs", "bfs_cached", "bfs_field", "bfs_bitboard", "dijkstra", "hamiltonian", "cnn", "cnn_2x", "cnn_5by5", "cnn_small")
+CNN_PLAYERS = ("cnn", "cnn_2x", "cnn_5by5", "cnn_small")
+
+
+def load_player(name):
+    """Returns the policy of a player and the function that starts its games
+    (the CNN players use the inference server if this process is connected to one)"""
+    if name == "bfs" or name.startswith("bfs_"):
+        from bfs_player.main import make_policy
+        return make_policy(name[len("bfs_"):] or "replan"), GameState
+    if name == "dijkstra":
+        from snake_game.main_dijkstra import make_policy
+        return make_policy(), GameState
+    if name == "hamiltonian":
+        from hamiltonian import make_policy
+        state = GameState()
+        return make_policy(state.height, state.width), GameState
+    if name == "cnn_small":
+        from cnn_players.small_snake.main import make_policy, new_game
+        return make_policy(remote_model(name)), new_game
+    from cnn_players.big_snake.main import make_policy
+    return make_policy(name, remote_model(name)), GameState
+
+
+_players = {} # Players already loaded in this process
+
+
+def play_game(task):
+    """Plays one headless game (runs in the worker processes)"""
+    name, seed, max_steps, replay_dir, n_food = task
+    if name not in _players:
+        _players[name] = load_player(name)
+    policy, new_game = _players[name]
+    replay_path = os.path.join(replay_dir, f"{name}_{seed}.snkr") if replay_dir else None
+    state = new_game(seed=seed) if n_food == 1 else new_game(seed=seed, n_food=n_food)
+    state = play(policy, headless=True, state=state, max_steps=max_steps, replay_path=replay_path)
+    return name, seed, state.score, state.steps
+
+
+def run_tournament(players, games, seed=0, workers=None, max_steps=None, replay_dir=None, n_food=1, server=False):
+    """Plays games seeded games per player and returns (player, seed, score, steps) rows
+    (server runs the CNN models in one inference server for all workers)"""
+    workers = workers or os.cpu_count()
+    tasks = [(name, seed + i, max_steps, replay_dir, n_food) for name in players for i in range(games)]
+    if replay_dir:
+        os.makedirs(replay_dir, exist_ok=True)
+
+    # Tasks are grouped by player, so each worker only loads a few players
+    chunksize = max(1, len(tasks) // (workers * 4))
+    models = [name for name in players if name in CNN_PLAYERS]
+    if not (server and models):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(play_game, tasks, chunksize=chunksize))
+
+    inference = InferenceServer(models, clients=workers)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=connect, initargs=inference.client_args()) as executor:
+            results = list(executor.map(play_game, tasks, chunksize=chunksize))
+    finally:
+        batches, samples = inference.close()
+    print(f"Inference server: {samples} moves in {batches} batches ({samples / max(batches, 1):.1f} per batch)")
+    return results
+
+
+def summarize(values):
+    """Distribution of a list of numbers"""
+    values = np.asarray(values)
+    return {
+        "mean": values.mean(),
+        "min": values.min(),
+        "p10": np.percentile(values, 10),
+        "median": np.median(values),
+        "p90": np.percentile(values, 90),
+        "max": values.max(),
+    }
+
+
+def print_summary(results):
+    """Prints the distributions of each player"""
+    for name in dict.fromkeys(row[0] for row in results):
+        rows = [row for row in results if row[0] == name]
+        scores = [row[2] for row in rows]
+        steps = [row[3] for row in rows]
+        steps_per_score = [row[3] // row[2] for row in rows]
+        print(f"{name} ({len(rows)} games)")
+        for label, values in (("score", scores), ("steps", steps), ("steps per score", steps_per_score)):
+            stats = "  ".join(f"{key} {value:.1f}" for key, value in summarize(values).items())
+            print(f"    {label:<16}{stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play seeded headless games for each player across all CPU cores")
+    parser.add_argument("--players", nargs="+", choices=PLAYERS, default=list(PLAYERS))
+    parser.add_argument("--games", type=int, default=100, help="games per player")
+    parser.add_argument("--seed", type=seed_arg, default=0, help="seed of the first game")
+    parser.add_argument("--workers", type=int, default=None, help="processes in the pool (default: all cores)")
+    parser.add_argument("--max-steps", type=int, default=20000, help="stop games that run longer than this")
+    parser.add_argument("--no-record", action="store_true", help="don't add the games to logger.csv")
+    parser.add_argument("--replays", default=None, metavar="DIR", help="save a replay of every game in DIR")
+    parser.add_argument("--food", type=int, default=1, help="foods on the board at once")
+    parser.add_argument("--server", action="store_true", help="predict the moves of the CNN players in one batched inference server")
+    args = parser.parse_args()
+    if args.food > 1 and "cnn_small" in args.players:
+        parser.error("the small snake only plays with one food")
+    if args.seed + args.games - 1 > MAX_SEED:
+        parser.error(f"the seeds of the games go past {MAX_SEED}")
+
+    results = run_tournament(args.players, args.games, args.seed, args.workers, args.max_steps, args.replays, args.food, args.server)
+    print_summary(results)
+    if not args.no_record:
+        append_records([(name, score, steps) for name, _, score, steps in results])